@@ -0,0 +1,71 @@
+import time
+from uuid import uuid4
+
+import numpy as np
+from django.core.cache import cache
+
+from app.models import Resource
+
+CATALOG_VERSION_KEY = 'resource_catalog:version'
+
+
+def bump_catalog_version():
+    """Makes every process reload its resource catalog. Call after changing ``Resource`` rows."""
+    cache.set(CATALOG_VERSION_KEY, uuid4().hex, timeout=None)
+
+
+class ResourceCatalog:
+    """
+    In-memory copy of the ``Resource`` table. The copy is reloaded when the version stored in the cache
+    changes, the version is checked at most once per ``check_interval`` seconds.
+
+    ``weights`` and ``tiers`` are NumPy arrays indexed by token id.
+    """
+
+    check_interval = 1
+
+    def __init__(self):
+        self.version = None
+        self.checked_at = 0
+        self.resources = []
+        self.by_token_id = {}
+        self.by_pk = {}
+        self.token_ids = []
+        self.weights = np.zeros(1, dtype=np.int64)
+        self.tiers = np.zeros(1, dtype=np.int64)
+
+    def refresh(self):
+        now = time.monotonic()
+        if self.version is not None and now - self.checked_at < self.check_interval:
+            return self
+        self.checked_at = now
+        cache.add(CATALOG_VERSION_KEY, uuid4().hex, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+        if version != self.version:
+            self.load()
+            self.version = version
+        return self
+
+    def load(self):
+        self.resources = list(Resource.objects.order_by('token_id'))
+        self.by_token_id = {r.token_id: r for r in self.resources}
+        self.by_pk = {r.pk: r for r in self.resources}
+        self.token_ids = [r.token_id for r in self.resources if r.token_id]
+        size = max(self.by_token_id, default=0) + 1
+        self.weights = np.zeros(size, dtype=np.int64)
+        self.tiers = np.zeros(size, dtype=np.int64)
+        for r in self.resources:
+            self.weights[r.token_id] = r.weight
+            self.tiers[r.token_id] = r.tier
+
+    def all(self):
+        return self.refresh().resources
+
+    def get(self, token_id):
+        return self.refresh().by_token_id.get(token_id)
+
+    def get_by_pk(self, pk):
+        return self.refresh().by_pk.get(pk)
+
+
+catalog = ResourceCatalog()
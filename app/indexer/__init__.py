@@ -0,0 +1,7 @@
+from app.indexer.backfill import backfill
+from app.indexer.decoder import Event, EventDecoder, build_decoders
+from app.indexer.handlers import MarketplaceHandler, LendingHandler, GamesHandler, TournamentHandler, ResourceHandler
+from app.indexer.indexer import Indexer, default_handlers
+from app.indexer.metrics import IndexerMetrics
+from app.indexer.subscription import HeadSubscription, HeadPolling
+from app.indexer.window import WindowController
@@ -0,0 +1,39 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from app.indexer.window import is_limit_error
+
+
+def fetch_segment(indexer, from_block, to_block):
+    """Fetches and decodes the events of a block range, splitting it in halves while the node rejects it as too large."""
+    try:
+        return indexer.decode(indexer.get_logs(from_block, to_block))
+    except Exception as e:
+        if not is_limit_error(e) or from_block == to_block:
+            raise
+        middle = (from_block + to_block) // 2
+        return fetch_segment(indexer, from_block, middle) + fetch_segment(indexer, middle + 1, to_block)
+
+
+def backfill(indexer, from_block, to_block, workers=4, segment_size=2000):
+    """
+    Fetches ``from_block`` ~ ``to_block`` in segments on a pool of ``workers`` threads and yields
+    ``(segment_from, segment_to, events)`` strictly in block order, so the caller can apply and checkpoint
+    each segment. At most ``2 * workers`` segments are held in memory.
+    """
+    segments = iter([(start, min(start + segment_size - 1, to_block)) for start in range(from_block, to_block + 1, segment_size)])
+    with ThreadPoolExecutor(workers) as executor:
+        pending = deque()
+
+        def submit():
+            segment = next(segments, None)
+            if segment:
+                pending.append((segment, executor.submit(fetch_segment, indexer, *segment)))
+
+        for _ in range(workers * 2):
+            submit()
+        while pending:
+            (start, end), future = pending.popleft()
+            events = future.result()
+            submit()
+            yield start, end, events
@@ -0,0 +1,93 @@
+import keyword
+from collections import namedtuple
+
+from eth_abi import decode_abi, decode_single
+from eth_utils import event_abi_to_log_topic, to_checksum_address
+
+
+class Event:
+    """Decoded log, a lightweight stand-in for web3's event ``AttributeDict``."""
+
+    __slots__ = 'event', 'address', 'args', 'blockNumber', 'logIndex', 'transactionHash', 'blockHash',
+
+    def __init__(self, event, address, args, blockNumber, logIndex, transactionHash, blockHash):
+        self.event = event
+        self.address = address
+        self.args = args
+        self.blockNumber = blockNumber
+        self.logIndex = logIndex
+        self.transactionHash = transactionHash
+        self.blockHash = blockHash
+
+    def __repr__(self):
+        return f'{self.event}{tuple(self.args)!r}@{self.blockNumber}:{self.logIndex}'
+
+
+def _to_address(value):
+    return to_checksum_address(value)
+
+
+def _to_address_list(value):
+    return [to_checksum_address(v) for v in value]
+
+
+def _topic_converter(abi_type):
+    """Returns a function decoding an indexed argument from its 32-byte topic."""
+    if abi_type.startswith('uint'):
+        return lambda topic: int.from_bytes(topic, 'big')
+    if abi_type == 'address':
+        return lambda topic: to_checksum_address(topic[12:])
+    if abi_type == 'bool':
+        return lambda topic: topic[-1] == 1
+    if abi_type in ('string', 'bytes') or abi_type.endswith(']') or abi_type.startswith('tuple'):
+        # dynamic values are indexed by their hash, which is all the topic holds
+        return bytes
+    return lambda topic: decode_single(abi_type, topic)
+
+
+def _data_converter(abi_type):
+    if abi_type == 'address':
+        return _to_address
+    if abi_type.startswith('address['):
+        return _to_address_list
+    return None
+
+
+class EventDecoder:
+    """Decodes the logs of one event ABI. Argument names that are Python keywords get a trailing underscore."""
+
+    def __init__(self, event_abi):
+        self.name = event_abi['name']
+        self.topic = event_abi_to_log_topic(event_abi)
+        inputs = event_abi['inputs']
+        names = [i['name'] + '_' if keyword.iskeyword(i['name']) else i['name'] for i in inputs]
+        self.args_type = namedtuple(f'{self.name}Args', names)
+        self.topic_converters = [(n, _topic_converter(i['type'])) for n, i in enumerate(inputs) if i['indexed']]
+        self.data_positions = [n for n, i in enumerate(inputs) if not i['indexed']]
+        self.data_types = [i['type'] for i in inputs if not i['indexed']]
+        self.data_converters = [_data_converter(t) for t in self.data_types]
+        self.size = len(inputs)
+
+    def decode(self, log):
+        values = [None] * self.size
+        topics = log['topics']
+        for (position, converter), topic in zip(self.topic_converters, topics[1:]):
+            values[position] = converter(topic)
+        if self.data_types:
+            data = log['data']
+            if isinstance(data, str):
+                data = bytes.fromhex(data[2:])
+            for position, converter, value in zip(self.data_positions, self.data_converters, decode_abi(self.data_types, data)):
+                values[position] = converter(value) if converter else value
+        return Event(self.name, log['address'], self.args_type(*values), log['blockNumber'], log['logIndex'],
+                     log['transactionHash'], log['blockHash'])
+
+
+def build_decoders(abi, names):
+    """Maps topic0 to an ``EventDecoder`` for every event of ``abi`` listed in ``names``."""
+    decoders = {}
+    for event_abi in abi:
+        if event_abi['type'] == 'event' and event_abi['name'] in names:
+            decoder = EventDecoder(event_abi)
+            decoders[decoder.topic] = decoder
+    return decoders
@@ -0,0 +1,596 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, Sum, F, Q
+from django.utils import timezone
+
+from app.catalog import catalog
+from app.models import Resource, MarketplaceListing, LendingListing, GameInfo, GamePlayer, GameMove, Tournament, \
+    TournamentPlayer, ResourceBalance, ResourceBalanceChange, IndexedBlock, PendingCraft
+from app.response_cache import bump_version
+from talecraft.crypto import START_BLOCK, resource_start_block
+from talecraft.multicall import multicall, batch_call
+
+LISTINGS_BATCH_SIZE = 100
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+
+# per-event log, disabled unless the indexer runs with --verbosity 2
+logger = logging.getLogger('app.indexer.events')
+
+
+class Handler:
+    """
+    Applies decoded events of a single contract. Events are routed to ``on_<EventName>`` methods,
+    which only change the objects fetched in ``prepare()``; the changes are written in bulk by ``flush()``.
+
+    Handlers add the players whose leaderboard weight their events (or rollbacks) may change to ``touched``.
+    """
+
+    stream = None
+    events = ()
+    # first block the contract may have emitted events at
+    start_block = START_BLOCK
+
+    def __init__(self, contract):
+        self.contract = contract
+        self.touched = set()
+
+    def prepare(self, events):
+        """Called with all events of the window before they are handled, to prefetch what they need in bulk."""
+
+    def handle(self, evt):
+        getattr(self, f'on_{evt.event}')(evt)
+
+    def flush(self):
+        """Writes the changes made by the handled events."""
+
+    def rollback(self, block_number):
+        """Reverts the effects of all events handled at ``block_number`` and later."""
+        raise NotImplementedError
+
+    def legacy_rows(self):
+        """Querysets of the rows indexed before their block number was recorded, which no rollback reaches."""
+        return []
+
+    def check_reset(self, block_number):
+        """Returns why the blocks since ``block_number`` can't be indexed again, ``None`` if they can."""
+        if block_number > self.start_block and any(rows.exists() for rows in self.legacy_rows()):
+            return f'The {self.stream} stream holds rows indexed before their block number was recorded, ' \
+                   f'reset it from its start block ({self.start_block}) to index them again'
+        return None
+
+    def reset(self, block_number):
+        """
+        Like ``rollback()``, for any ``block_number`` since ``start_block``, to index the following blocks again.
+        Resetting the whole history also deletes the ``legacy_rows()``.
+        """
+        self.rollback(block_number)
+        if block_number <= self.start_block:
+            for rows in self.legacy_rows():
+                rows.delete()
+
+
+class ListingHandler(Handler):
+    model = None
+    update_fields = ()
+
+    def fetch_listings(self, listing_ids):
+        raise NotImplementedError
+
+    def build_listing(self, evt, listing):
+        raise NotImplementedError
+
+    def prepare(self, events):
+        new_ids = [evt.args.listingId for evt in events if evt.event == 'NewListing']
+        self.new_listings = dict(zip(new_ids, self.fetch_listings(new_ids)))
+        self.listings = {}
+        for listing in self.model.objects.filter(listing_id__in={evt.args.listingId for evt in events}).order_by('-pk'):
+            self.listings[listing.listing_id] = listing
+        self.created = []
+        self.updated = {}
+
+    def get_resource(self, token_id):
+        resource = catalog.get(token_id)
+        if resource is None:
+            raise Resource.DoesNotExist(f'Resource #{token_id} is not loaded')
+        return resource
+
+    def created_listing(self, evt):
+        listing = self.build_listing(evt, self.new_listings[evt.args.listingId])
+        self.listings[listing.listing_id] = listing
+        self.created.append(listing)
+        logger.warning('    Listing #%s created', evt.args.listingId)
+
+    def get_listing(self, evt):
+        listing = self.listings.get(evt.args.listingId)
+        if listing is not None and listing.pk:
+            self.updated[listing.pk] = listing
+        return listing
+
+    def flush(self):
+        self.model.objects.bulk_create(self.created)
+        self.model.objects.bulk_update(self.updated.values(), self.update_fields)
+        if self.created or self.updated:
+            self.invalidate_responses()
+
+    def invalidate_responses(self):
+        transaction.on_commit(lambda: bump_version(self.model))
+
+
+class MarketplaceHandler(ListingHandler):
+    stream = 'marketplace'
+    events = 'NewListing', 'ListingCancelled', 'Trade',
+    model = MarketplaceListing
+    update_fields = 'buyer', 'closed', 'closed_at', 'closed_block',
+
+    def fetch_listings(self, listing_ids):
+        return multicall([self.contract.functions.getListing(lid) for lid in listing_ids], batch_size=LISTINGS_BATCH_SIZE)
+
+    def build_listing(self, evt, listing):
+        return MarketplaceListing(listing_id=evt.args.listingId,
+                                  resource=self.get_resource(listing[0]),
+                                  amount=listing[1],
+                                  price=listing[2] / 10**18,
+                                  seller=listing[3],
+                                  block_number=evt.blockNumber)
+
+    def on_NewListing(self, evt):
+        logger.warning('    NewListing(seller=%s, listingId=%s)', evt.args.seller, evt.args.listingId)
+        self.created_listing(evt)
+
+    def on_ListingCancelled(self, evt):
+        logger.warning('    ListingCancelled(listingId=%s)', evt.args.listingId)
+        listing = self.get_listing(evt)
+        if listing:
+            listing.closed = True
+            listing.closed_at = timezone.now()
+            listing.closed_block = evt.blockNumber
+            logger.warning('    Listing #%s cancelled', evt.args.listingId)
+        else:
+            logging.warning(f'    Did not find listing #{evt.args.listingId} to cancel')
+
+    def on_Trade(self, evt):
+        logger.warning('    Trade(seller=%s, buyer=%s, listingId=%s)', evt.args.seller, evt.args.buyer, evt.args.listingId)
+        listing = self.get_listing(evt)
+        if listing:
+            listing.buyer = evt.args.buyer
+            listing.closed = True
+            listing.closed_at = timezone.now()
+            listing.closed_block = evt.blockNumber
+            logger.warning('    Listing #%s finished', evt.args.listingId)
+        else:
+            logging.warning(f'    Did not find listing #{evt.args.listingId} to finished')
+
+    def legacy_rows(self):
+        return [MarketplaceListing.objects.filter(block_number__isnull=True)]
+
+    def rollback(self, block_number):
+        MarketplaceListing.objects.filter(block_number__gte=block_number).delete()
+        MarketplaceListing.objects.filter(closed_block__gte=block_number).update(closed=False, closed_at=None, buyer=None, closed_block=None)
+        self.invalidate_responses()
+
+
+class LendingHandler(ListingHandler):
+    stream = 'lending'
+    events = 'NewListing', 'ListingCancelled', 'Borrow',
+    model = LendingListing
+    update_fields = 'borrower', 'started', 'started_block', 'closed', 'closed_at', 'closed_block',
+
+    def fetch_listings(self, listing_ids):
+        chunks = batch_call([self.contract.functions.getListings(listing_ids[offset:offset + LISTINGS_BATCH_SIZE])
+                             for offset in range(0, len(listing_ids), LISTINGS_BATCH_SIZE)])
+        return [listing for chunk in chunks for listing in chunk]
+
+    def build_listing(self, evt, listing):
+        return LendingListing(listing_id=evt.args.listingId,
+                              resource=self.get_resource(listing[3]),
+                              duration=timedelta(seconds=min(999999999, listing[1])),
+                              price=listing[2] / 10**18,
+                              lender=listing[4],
+                              block_number=evt.blockNumber)
+
+    def on_NewListing(self, evt):
+        logger.warning('    NewListing(lender=%s, listingId=%s)', evt.args.lender, evt.args.listingId)
+        self.created_listing(evt)
+        self.touched.add(evt.args.lender)
+
+    def on_ListingCancelled(self, evt):
+        logger.warning('    ListingCancelled(listingId=%s)', evt.args.listingId)
+        listing = self.get_listing(evt)
+        if listing:
+            listing.closed = True
+            listing.closed_at = timezone.now()
+            listing.closed_block = evt.blockNumber
+            self.touched.add(listing.lender)
+            logger.warning('    Listing #%s cancelled', evt.args.listingId)
+        else:
+            logging.warning(f'    Did not find listing #{evt.args.listingId} to cancel')
+
+    def on_Borrow(self, evt):
+        logger.warning('    Borrow(lender=%s, borrower=%s, listingId=%s)', evt.args.lender, evt.args.borrower, evt.args.listingId)
+        listing = self.get_listing(evt)
+        if listing:
+            listing.borrower = evt.args.borrower
+            listing.started = timezone.now()
+            listing.started_block = evt.blockNumber
+            logger.warning('    Listing #%s borrowed', evt.args.listingId)
+        else:
+            logging.warning(f'    Did not find listing #{evt.args.listingId} to finished')
+
+    def legacy_rows(self):
+        return [LendingListing.objects.filter(block_number__isnull=True)]
+
+    def rollback(self, block_number):
+        self.touched.update(LendingListing.objects.filter(Q(block_number__gte=block_number) | Q(closed_block__gte=block_number))
+                            .values_list('lender', flat=True))
+        LendingListing.objects.filter(block_number__gte=block_number).delete()
+        LendingListing.objects.filter(started_block__gte=block_number).update(borrower=None, started=None, started_block=None)
+        LendingListing.objects.filter(closed_block__gte=block_number).update(closed=False, closed_at=None, closed_block=None)
+        self.invalidate_responses()
+
+
+class GamesHandler(Handler):
+    stream = 'games'
+    events = 'PlayerEntered', 'PlayerLeft', 'GameStarted', 'GameFinished', 'GameAborted', 'PlayerPlacedCard', 'PowerUsed',
+
+    def __init__(self, contract, league):
+        super().__init__(contract)
+        self.league = league
+
+    def prepare(self, events):
+        game_ids = {evt.args.gameId for evt in events if evt.event in GamesHandler.events}
+        self.games = {game.game_id: game for game in GameInfo.objects.filter(league=self.league, game_id__in=game_ids)}
+        self.players = {}
+        for player in GamePlayer.objects.filter(game__in=self.games.values(), left_block__isnull=True).select_related('game'):
+            self.players.setdefault(player.game.game_id, []).append(player)
+        # cards placed so far by each player of a game; a player places one card per round
+        self.placed_cards = {}
+        if any(evt.event == 'PlayerPlacedCard' for evt in events):
+            placed = GameMove.objects.filter(game__in=self.games.values(), kind=GameMove.CARD) \
+                .values_list('game__game_id', 'player').annotate(count=Count('pk'))
+            self.placed_cards = {(game_id, player): count for game_id, player, count in placed}
+        self.created_games = []
+        self.created_players = []
+        self.created_moves = []
+        self.updated_games = {}
+        self.updated_players = {}
+
+    def find_game(self, evt):
+        game = self.games.get(evt.args.gameId)
+        if game is None:
+            raise GameInfo.DoesNotExist(f'Game #{evt.args.gameId} of league {self.league} is not indexed')
+        return game
+
+    def get_game(self, evt):
+        game = self.find_game(evt)
+        if game.pk:
+            self.updated_games[game.pk] = game
+        return game
+
+    def on_PlayerEntered(self, evt):
+        logger.warning('    PlayerEntered(gameId=%s, player=%s)', evt.args.gameId, evt.args.player)
+        game = self.games.get(evt.args.gameId)
+        if game is None:
+            game = self.games[evt.args.gameId] = GameInfo(league=self.league, game_id=evt.args.gameId, block_number=evt.blockNumber)
+            self.created_games.append(game)
+        player = GamePlayer(game=game, address=evt.args.player, block_number=evt.blockNumber)
+        self.players.setdefault(evt.args.gameId, []).append(player)
+        self.created_players.append(player)
+
+    def on_PlayerLeft(self, evt):
+        logger.warning('    PlayerLeft(gameId=%s, player=%s)', evt.args.gameId, evt.args.player)
+        self.get_game(evt)
+        players = self.players.get(evt.args.gameId, [])
+        for player in [p for p in players if p.address == evt.args.player]:
+            player.left_block = evt.blockNumber
+            players.remove(player)
+            if player.pk:
+                self.updated_players[player.pk] = player
+
+    def on_GameStarted(self, evt):
+        logger.warning('    GameStarted(gameId=%s)', evt.args.gameId)
+        game = self.get_game(evt)
+        game.started = True
+        game.started_block = evt.blockNumber
+
+    def on_GameFinished(self, evt):
+        logger.warning('    GameFinished(gameId=%s, winner=%s)', evt.args.gameId, evt.args.winner)
+        game = self.get_game(evt)
+        game.winner = evt.args.winner
+        game.finished = True
+        game.finished_block = evt.blockNumber
+
+    def on_GameAborted(self, evt):
+        logger.warning('    GameAborted(gameId=%s, winner=%s)', evt.args.gameId, evt.args.winner)
+        game = self.get_game(evt)
+        game.winner = evt.args.winner
+        game.finished = True
+        game.finished_block = evt.blockNumber
+
+    def on_PlayerPlacedCard(self, evt):
+        logger.warning('    PlayerPlacedCard(gameId=%s, player=%s, tokenId=%s)', evt.args.gameId, evt.args.player, evt.args.tokenId)
+        key = evt.args.gameId, evt.args.player
+        round_ = self.placed_cards.get(key, 0)
+        self.placed_cards[key] = round_ + 1
+        self.created_moves.append(GameMove(game=self.find_game(evt), player=evt.args.player, kind=GameMove.CARD,
+                                           round=round_, token_id=evt.args.tokenId,
+                                           block_number=evt.blockNumber, log_index=evt.logIndex))
+
+    def on_PowerUsed(self, evt):
+        logger.warning('    PowerUsed(gameId=%s, player=%s, round=%s, powerType=%s)', evt.args.gameId, evt.args.player, evt.args.round, evt.args.powerType)
+        self.created_moves.append(GameMove(game=self.find_game(evt), player=evt.args.player, kind=GameMove.POWER,
+                                           round=evt.args.round, power_type=evt.args.powerType, power_value=evt.args.value,
+                                           block_number=evt.blockNumber, log_index=evt.logIndex))
+
+    def flush(self):
+        GameInfo.objects.bulk_create(self.created_games)
+        GamePlayer.objects.bulk_create(self.created_players)
+        GameMove.objects.bulk_create(self.created_moves)
+        GameInfo.objects.bulk_update(self.updated_games.values(), ['started', 'started_block', 'winner', 'finished', 'finished_block'])
+        GamePlayer.objects.bulk_update(self.updated_players.values(), ['left_block'])
+
+    def legacy_rows(self):
+        games = GameInfo.objects.filter(league=self.league)
+        return [GamePlayer.objects.filter(game__in=games, block_number__isnull=True), games.filter(block_number__isnull=True)]
+
+    def rollback(self, block_number):
+        games = GameInfo.objects.filter(league=self.league)
+        GamePlayer.objects.filter(game__in=games, block_number__gte=block_number).delete()
+        GameMove.objects.filter(game__in=games, block_number__gte=block_number).delete()
+        GamePlayer.objects.filter(game__in=games, left_block__gte=block_number).update(left_block=None)
+        games.filter(block_number__gte=block_number).delete()
+        games.filter(started_block__gte=block_number).update(started=False, started_block=None)
+        games.filter(finished_block__gte=block_number).update(winner=None, finished=False, finished_block=None)
+
+
+class TournamentHandler(GamesHandler):
+    """
+    Tournaments of the tournament contract and their games, which are stored with ``GameInfo.TOURNAMENT_LEAGUE``.
+
+    A game belongs to the tournament its players joined last, and its round is the number of games of that
+    tournament its players entered before. Tournaments are created from the first event mentioning them,
+    as the contract does not emit ``TournamentCreated``; their settings are read from ``getTournaments()``.
+    """
+
+    stream = 'tournaments'
+    events = GamesHandler.events + ('TournamentCreated', 'TournamentJoin', 'TournamentStart', 'TournamentFinish')
+
+    def __init__(self, contract):
+        super().__init__(contract, league=GameInfo.TOURNAMENT_LEAGUE)
+
+    def prepare(self, events):
+        super().prepare(events)
+        entered = {evt.args.player for evt in events if evt.event == 'PlayerEntered'}
+        joins = list(TournamentPlayer.objects.filter(address__in=entered).order_by('block_number', 'log_index')
+                     .values_list('address', 'tournament__tournament_id'))
+        tournament_ids = {evt.args.tournamentId for evt in events if evt.event.startswith('Tournament')} | {tid for _, tid in joins}
+        self.tournaments = {t.tournament_id: t for t in Tournament.objects.filter(tournament_id__in=tournament_ids)}
+        self.current_tournaments = {address: self.tournaments[tid] for address, tid in joins}
+        # games of a tournament entered by a player so far, which is the round of the next one
+        self.entered_games = {
+            (tid, address): count for tid, address, count in
+            GamePlayer.objects.filter(game__tournament__tournament_id__in=tournament_ids, address__in=entered)
+            .values_list('game__tournament__tournament_id', 'address').annotate(count=Count('pk'))
+        }
+        missing = sorted(tournament_ids - self.tournaments.keys())
+        self.fetched_tournaments = dict(zip(missing, self.contract.functions.getTournaments(missing).call() if missing else []))
+        # winners of drawn games are chosen by a dice roll after the event is emitted
+        rolled = [evt.args.gameId for evt in events if evt.event in ('GameFinished', 'GameAborted') and evt.args.winner == ZERO_ADDRESS]
+        self.rolled_winners = {game_id: game[5] for game_id, game in zip(rolled, batch_call([self.contract.functions.game(game_id) for game_id in rolled]))}
+        self.created_tournaments = []
+        self.updated_tournaments = {}
+        self.joined_players = []
+        self.last_winner = None
+
+    def get_tournament(self, evt):
+        tournament = self.tournaments.get(evt.args.tournamentId)
+        if tournament is None:
+            _, _, _, _, _, start_time, join_deadline, players_count, *_ = self.fetched_tournaments[evt.args.tournamentId]
+            tournament = self.tournaments[evt.args.tournamentId] = Tournament(
+                tournament_id=evt.args.tournamentId,
+                players_count=players_count,
+                start_time=datetime.fromtimestamp(start_time, dt_timezone.utc),
+                join_deadline=datetime.fromtimestamp(join_deadline, dt_timezone.utc),
+                block_number=evt.blockNumber)
+            self.created_tournaments.append(tournament)
+        elif tournament.pk:
+            self.updated_tournaments[tournament.pk] = tournament
+        return tournament
+
+    def on_TournamentCreated(self, evt):
+        logger.warning('    TournamentCreated(tournamentId=%s)', evt.args.tournamentId)
+        self.get_tournament(evt)
+
+    def on_TournamentJoin(self, evt):
+        logger.warning('    TournamentJoin(tournamentId=%s, account=%s)', evt.args.tournamentId, evt.args.account)
+        tournament = self.get_tournament(evt)
+        self.current_tournaments[evt.args.account] = tournament
+        self.joined_players.append(TournamentPlayer(tournament=tournament, address=evt.args.account,
+                                                    block_number=evt.blockNumber, log_index=evt.logIndex))
+
+    def on_TournamentStart(self, evt):
+        logger.warning('    TournamentStart(tournamentId=%s)', evt.args.tournamentId)
+        tournament = self.get_tournament(evt)
+        tournament.started = True
+        tournament.started_block = evt.blockNumber
+
+    def on_TournamentFinish(self, evt):
+        logger.warning('    TournamentFinish(tournamentId=%s)', evt.args.tournamentId)
+        tournament = self.get_tournament(evt)
+        # emitted right after the final game ends, in the same transaction
+        tournament.winner = self.last_winner
+        tournament.finished = True
+        tournament.finished_block = evt.blockNumber
+
+    def on_PlayerEntered(self, evt):
+        super().on_PlayerEntered(evt)
+        tournament = self.current_tournaments.get(evt.args.player)
+        if tournament is None:
+            logging.warning(f'    Did not find the tournament of player {evt.args.player} in game #{evt.args.gameId}')
+            return
+        key = tournament.tournament_id, evt.args.player
+        game = self.games[evt.args.gameId]
+        if game.pk is None and game.tournament_round is None:
+            game.tournament = tournament
+            game.tournament_round = self.entered_games.get(key, 0)
+        self.entered_games[key] = self.entered_games.get(key, 0) + 1
+
+    def on_GameFinished(self, evt):
+        super().on_GameFinished(evt)
+        self.finished_game(evt)
+
+    def on_GameAborted(self, evt):
+        super().on_GameAborted(evt)
+        self.finished_game(evt)
+
+    def finished_game(self, evt):
+        game = self.find_game(evt)
+        if game.winner == ZERO_ADDRESS:
+            game.winner = self.rolled_winners.get(evt.args.gameId, game.winner)
+        self.last_winner = game.winner
+
+    def flush(self):
+        Tournament.objects.bulk_create(self.created_tournaments)
+        TournamentPlayer.objects.bulk_create(self.joined_players)
+        super().flush()
+        Tournament.objects.bulk_update(self.updated_tournaments.values(), ['started', 'started_block', 'winner', 'finished', 'finished_block'])
+
+    def legacy_rows(self):
+        return super().legacy_rows() + [Tournament.objects.filter(block_number__isnull=True)]
+
+    def rollback(self, block_number):
+        super().rollback(block_number)
+        TournamentPlayer.objects.filter(block_number__gte=block_number).delete()
+        Tournament.objects.filter(block_number__gte=block_number).delete()
+        Tournament.objects.filter(started_block__gte=block_number).update(started=False, started_block=None)
+        Tournament.objects.filter(finished_block__gte=block_number).update(winner=None, finished=False, finished_block=None)
+
+
+class ResourceHandler(Handler):
+    """
+    Keeps ``ResourceBalance`` in sync with the ERC-1155 transfers of the resource contract, and ``PendingCraft``
+    with its crafts. Balance deltas are also journaled in ``ResourceBalanceChange`` for as long as a reorg can reach them.
+    """
+
+    stream = 'resources'
+    events = 'TransferSingle', 'TransferBatch', 'CraftStarted', 'CraftClaimed',
+
+    @property
+    def start_block(self):
+        return resource_start_block()
+
+    def transfers(self, evt):
+        if evt.event == 'TransferSingle':
+            return [(evt.args.from_, evt.args.to, evt.args.id, evt.args.value)]
+        return [(evt.args.from_, evt.args.to, token_id, value) for token_id, value in zip(evt.args.ids, evt.args.values)]
+
+    def prepare(self, events):
+        addresses, token_ids = set(), set()
+        for evt in events:
+            if not evt.event.startswith('Transfer'):
+                continue
+            for sender, receiver, token_id, _ in self.transfers(evt):
+                addresses.update((sender, receiver))
+                token_ids.add(token_id)
+        addresses.discard(ZERO_ADDRESS)
+        self.balances = {
+            (balance.address, balance.token_id): balance
+            for balance in ResourceBalance.objects.filter(address__in=addresses, token_id__in=token_ids)
+        }
+        self.created = []
+        self.updated = {}
+        # (block number, address, token id) -> delta
+        self.deltas = defaultdict(int)
+
+        # the crafted token is not in the event
+        started = [evt.args.craftId for evt in events if evt.event == 'CraftStarted']
+        chunks = batch_call([self.contract.functions.getCrafts(started[offset:offset + LISTINGS_BATCH_SIZE])
+                             for offset in range(0, len(started), LISTINGS_BATCH_SIZE)])
+        self.started_crafts = {craft_id: craft[0] for craft_id, craft in zip(started, (craft for chunk in chunks for craft in chunk))}
+        claimed = [evt.args.craftId for evt in events if evt.event == 'CraftClaimed']
+        self.crafts = {craft.craft_id: craft for craft in PendingCraft.objects.filter(craft_id__in=claimed)}
+        self.created_crafts = []
+        self.updated_crafts = {}
+
+    def get_balance(self, address, token_id):
+        balance = self.balances.get((address, token_id))
+        if balance is None:
+            balance = self.balances[(address, token_id)] = ResourceBalance(address=address, token_id=token_id)
+            self.created.append(balance)
+        elif balance.pk:
+            self.updated[balance.pk] = balance
+        return balance
+
+    def transfer(self, evt):
+        for sender, receiver, token_id, value in self.transfers(evt):
+            for address, delta in ((sender, -value), (receiver, value)):
+                if address == ZERO_ADDRESS or not delta:
+                    continue
+                self.get_balance(address, token_id).balance += delta
+                self.deltas[(evt.blockNumber, address, token_id)] += delta
+                self.touched.add(address)
+
+    def on_TransferSingle(self, evt):
+        logger.warning('    TransferSingle(from=%s, to=%s, id=%s, value=%s)', evt.args.from_, evt.args.to, evt.args.id, evt.args.value)
+        self.transfer(evt)
+
+    def on_TransferBatch(self, evt):
+        logger.warning('    TransferBatch(from=%s, to=%s, ids=%s, values=%s)', evt.args.from_, evt.args.to, evt.args.ids, evt.args.values)
+        self.transfer(evt)
+
+    def on_CraftStarted(self, evt):
+        logger.warning('    CraftStarted(player=%s, craftId=%s)', evt.args.player, evt.args.craftId)
+        craft = self.crafts[evt.args.craftId] = PendingCraft(craft_id=evt.args.craftId, player=evt.args.player,
+                                                             token_id=self.started_crafts[evt.args.craftId],
+                                                             block_number=evt.blockNumber)
+        self.created_crafts.append(craft)
+        self.touched.add(evt.args.player)
+
+    def on_CraftClaimed(self, evt):
+        logger.warning('    CraftClaimed(player=%s, craftId=%s)', evt.args.player, evt.args.craftId)
+        craft = self.crafts.get(evt.args.craftId)
+        if craft is None:
+            logging.warning(f'    Did not find craft #{evt.args.craftId} to claim')
+            return
+        craft.claimed_block = evt.blockNumber
+        if craft.pk:
+            self.updated_crafts[craft.pk] = craft
+        self.touched.add(evt.args.player)
+
+    def flush(self):
+        ResourceBalance.objects.bulk_create(self.created)
+        ResourceBalance.objects.bulk_update(self.updated.values(), ['balance'])
+        PendingCraft.objects.bulk_create(self.created_crafts)
+        PendingCraft.objects.bulk_update(self.updated_crafts.values(), ['claimed_block'])
+        ResourceBalanceChange.objects.bulk_create([
+            ResourceBalanceChange(address=address, token_id=token_id, delta=delta, block_number=block_number)
+            for (block_number, address, token_id), delta in self.deltas.items() if delta
+        ])
+        # reorgs deeper than the oldest checkpoint are not recoverable anyway
+        oldest_checkpoint = IndexedBlock.objects.order_by('number').values_list('number', flat=True).first()
+        if oldest_checkpoint is not None:
+            ResourceBalanceChange.objects.filter(block_number__lt=oldest_checkpoint).delete()
+
+    def rollback(self, block_number):
+        crafts = PendingCraft.objects.filter(Q(block_number__gte=block_number) | Q(claimed_block__gte=block_number))
+        self.touched.update(crafts.values_list('player', flat=True))
+        PendingCraft.objects.filter(block_number__gte=block_number).delete()
+        PendingCraft.objects.filter(claimed_block__gte=block_number).update(claimed_block=None)
+        changes = ResourceBalanceChange.objects.filter(block_number__gte=block_number)
+        self.touched.update(changes.values_list('address', flat=True))
+        for address, token_id, delta in changes.values_list('address', 'token_id').annotate(delta=Sum('delta')):
+            ResourceBalance.objects.filter(address=address, token_id=token_id).update(balance=F('balance') - delta)
+        changes.delete()
+
+    def check_reset(self, block_number):
+        if block_number > self.start_block:
+            # the balance changes are only journaled for as long as a reorg can reach them
+            return f'Resource balances can only be indexed again from the start block of the stream ({self.start_block})'
+        return None
+
+    def reset(self, block_number):
+        ResourceBalance.objects.all().delete()
+        ResourceBalanceChange.objects.all().delete()
+        PendingCraft.objects.all().delete()
@@ -0,0 +1,236 @@
+from django.utils import timezone
+from eth_utils import to_hex
+
+from talecraft.crypto import web3, marketplace, lending, games, tournament, resource
+from app.indexer.decoder import build_decoders
+from app.indexer.handlers import MarketplaceHandler, LendingHandler, GamesHandler, TournamentHandler, ResourceHandler
+from app import leaderboard
+from app.models import IndexedBlock, IndexerCursor
+
+# how many block hash checkpoints are kept to find the fork point of a reorg
+CHECKPOINTS_KEPT = 256
+
+
+def default_handlers(streams=None):
+    handlers = [
+        MarketplaceHandler(marketplace),
+        LendingHandler(lending),
+        *(GamesHandler(contract, league=i) for i, contract in enumerate(games.values())),
+        TournamentHandler(tournament),
+        ResourceHandler(resource),
+    ]
+    return [h for h in handlers if streams is None or h.stream in streams]
+
+
+class Indexer:
+    """
+    Fetches the events of all tracked contracts with a single ``eth_getLogs`` per block range
+    and dispatches them to the contract handlers in chain order.
+
+    Each handler has its own ``IndexerCursor``; events at or before the cursor of their handler are skipped,
+    so handlers whose cursors lag behind the others catch up without the others applying events twice.
+    """
+
+    def __init__(self, handlers=None):
+        self.handlers = {h.contract.address: h for h in (handlers if handlers is not None else default_handlers())}
+        # (address, topic0) -> decoder of the log
+        self.decoders = {}
+        for address, handler in self.handlers.items():
+            for topic, decoder in build_decoders(handler.contract.abi, handler.events).items():
+                self.decoders[(address, topic)] = decoder
+        self.addresses = list(self.handlers.keys())
+        self.topics = sorted({to_hex(topic) for _, topic in self.decoders.keys()})
+        self.cursors = {}
+
+    def get_logs(self, from_block, to_block):
+        return web3.eth.get_logs({
+            'fromBlock': from_block,
+            'toBlock': to_block,
+            'address': self.addresses,
+            'topics': [self.topics],
+        })
+
+    def decode(self, logs):
+        events = []
+        for log in logs:
+            decoder = self.decoders.get((log['address'], bytes(log['topics'][0])))
+            if decoder is None:
+                # same event signature emitted by another tracked contract
+                continue
+            if log['blockNumber'] <= self.cursors[log['address']].block_number:
+                continue
+            events.append(decoder.decode(log))
+        events.sort(key=lambda evt: (evt.blockNumber, evt.logIndex))
+        return events
+
+    def prepare(self, events):
+        """Fetches everything the handlers need to apply ``events``. Meant to run outside of the transaction."""
+        for address, handler in self.handlers.items():
+            handler.prepare([evt for evt in events if evt.address == address])
+
+    def apply(self, events, head=None):
+        """
+        Applies ``events`` fetched and prepared after the cursors were loaded. Must run in a transaction: the cursors
+        are locked until it ends, and the events another process applied since they were loaded are left out.
+
+        Given the ``head`` of the chain, the leaderboard weights of the players touched by the events are updated
+        once the index can be relied on for them (see ``leaderboard.index_is_live()``).
+        """
+        if self.lock_cursors():
+            events = [evt for evt in events if evt.blockNumber > self.cursors[evt.address].block_number]
+            self.prepare(events)
+        for evt in events:
+            self.handlers[evt.address].handle(evt)
+        for handler in self.handlers.values():
+            handler.flush()
+        self.update_leaderboard(head)
+
+    def update_leaderboard(self, head=None):
+        """
+        Recomputes the leaderboard weights of the players touched by the handlers since the last call, if the resources
+        and lending streams are both indexed by this indexer and live, and records it on the resources cursor.
+        ``update_leaderboard`` sweeps the node while no indexer has recorded it lately (see ``leaderboard.is_maintained()``).
+        """
+        touched = set()
+        for handler in self.handlers.values():
+            touched |= handler.touched
+            handler.touched = set()
+        if head is not None and leaderboard.index_is_live(self.cursors.values(), head):
+            leaderboard.update_players(touched)
+            IndexerCursor.objects.filter(pk__in=[c.pk for c in self.cursors.values() if c.stream == 'resources']) \
+                .update(leaderboard_updated_at=timezone.now())
+
+    def load_cursors(self):
+        """Reads the cursors of the handlers. Returns whether every handler has one."""
+        streams = {h.stream for h in self.handlers.values()}
+        self.cursors = {
+            cursor.contract: cursor
+            for cursor in IndexerCursor.objects.filter(contract__in=self.addresses, stream__in=streams)
+            if self.handlers[cursor.contract].stream == cursor.stream
+        }
+        return len(self.cursors) == len(self.handlers)
+
+    def lock_cursors(self):
+        """Reloads the cursors with ``SELECT ... FOR UPDATE``. Returns whether another process advanced them since they were loaded."""
+        locked = {
+            cursor.contract: cursor
+            for cursor in IndexerCursor.objects.select_for_update().filter(pk__in=[c.pk for c in self.cursors.values()]).order_by('pk')
+        }
+        if len(locked) < len(self.cursors) or any(locked[a].block_number < c.block_number for a, c in self.cursors.items()):
+            raise Exception('Indexer cursors were reset or rolled back by another process')
+        advanced = any(locked[a].block_number > c.block_number for a, c in self.cursors.items())
+        self.cursors = locked
+        return advanced
+
+    def init_cursors(self, block_number=None, start_blocks=None):
+        """
+        Creates the missing cursors, as if everything up to ``block_number`` was indexed, or up to ``start_blocks[stream]``
+        for the streams in ``start_blocks``. Without ``block_number``, the handlers index from their ``start_block``.
+        """
+        start_blocks = start_blocks or {}
+        IndexerCursor.objects.bulk_create([
+            IndexerCursor(contract=address, stream=handler.stream, block_number=block, start_block=block + 1)
+            for address, handler, block in (
+                (address, handler, start_blocks.get(handler.stream, handler.start_block - 1 if block_number is None else block_number))
+                for address, handler in self.handlers.items() if address not in self.cursors
+            )
+        ], ignore_conflicts=True)
+        self.load_cursors()
+
+    def split(self, max_lag):
+        """
+        Groups the handlers whose cursors are at most ``max_lag`` blocks apart, the most advanced group first.
+        Each group is indexed over its own block range, so that streams which were added or reset catch up
+        without holding back the others.
+        """
+        groups = []
+        for cursor in sorted(self.cursors.values(), key=lambda c: c.block_number, reverse=True):
+            if groups and groups[-1][-1].block_number - cursor.block_number <= max_lag:
+                groups[-1].append(cursor)
+            else:
+                groups.append([cursor])
+        if len(groups) <= 1:
+            return [self]
+        return [self.subset(c.contract for c in group) for group in groups]
+
+    def subset(self, addresses):
+        """Returns an indexer for the given handlers, sharing their handler objects and cursors."""
+        addresses = set(addresses)
+        indexer = Indexer([h for address, h in self.handlers.items() if address in addresses])
+        indexer.cursors = {address: c for address, c in self.cursors.items() if address in addresses}
+        return indexer
+
+    @property
+    def streams(self):
+        return sorted({h.stream for h in self.handlers.values()})
+
+    @property
+    def last_block(self):
+        return min(cursor.block_number for cursor in self.cursors.values())
+
+    def save_cursors(self, block_number, block_hash):
+        now = timezone.now()
+        IndexerCursor.objects.filter(pk__in=[c.pk for c in self.cursors.values()], block_number__lt=block_number) \
+            .update(block_number=block_number, block_hash=block_hash, updated_at=now)
+        for cursor in self.cursors.values():
+            if cursor.block_number < block_number:
+                cursor.block_number, cursor.block_hash, cursor.updated_at = block_number, block_hash, now
+
+    def get_block_hash(self, block_number):
+        return self.get_block_header(block_number)[0]
+
+    def get_block_header(self, block_number):
+        block = web3.eth.get_block(block_number)
+        return to_hex(block.hash), block.timestamp
+
+    def checkpoint(self, block_number, block_hash):
+        IndexedBlock.objects.update_or_create(number=block_number, defaults={'hash': block_hash})
+        stale = IndexedBlock.objects.order_by('-number').values_list('number', flat=True)[CHECKPOINTS_KEPT:CHECKPOINTS_KEPT + 1]
+        if stale:
+            IndexedBlock.objects.filter(number__lte=stale[0]).delete()
+        self.save_cursors(block_number, block_hash)
+
+    def find_fork(self):
+        """
+        Checks that the chain continues from the last indexed block. Returns ``None`` if it does,
+        otherwise the latest checkpointed block that is still part of the chain.
+        """
+        last_block = self.last_block
+        last_hash = next(c.block_hash for c in self.cursors.values() if c.block_number == last_block)
+        if not last_hash or to_hex(web3.eth.get_block(last_block + 1).parentHash) == last_hash:
+            return None
+        for checkpoint in IndexedBlock.objects.filter(number__lt=last_block).order_by('-number'):
+            if self.get_block_hash(checkpoint.number) == checkpoint.hash:
+                return checkpoint.number
+        raise Exception(f'Chain reorganization deeper than the {CHECKPOINTS_KEPT} kept checkpoints, full reindex is required')
+
+    def check_reset(self, block_number):
+        """Returns why the handlers can't index the blocks since ``block_number`` again, if any can't."""
+        errors = (h.check_reset(block_number) for h in self.handlers.values())
+        # the game leagues share their stream
+        return list(dict.fromkeys(error for error in errors if error))
+
+    def reset(self, block_number):
+        """Reverts the events of the handlers at ``block_number`` and later and moves their cursors before it, to index them again."""
+        errors = self.check_reset(block_number)
+        if errors:
+            raise Exception('; '.join(errors))
+        for handler in self.handlers.values():
+            handler.reset(block_number)
+        now = timezone.now()
+        for address, cursor in self.cursors.items():
+            cursor.block_number, cursor.block_hash, cursor.updated_at = block_number - 1, '', now
+            # the blocks before ``block_number`` keep what was indexed from them, if anything
+            if cursor.start_block is None or cursor.start_block > block_number or self.handlers[address].start_block >= block_number:
+                cursor.start_block = block_number
+        IndexerCursor.objects.bulk_update(self.cursors.values(), ['block_number', 'block_hash', 'start_block', 'updated_at'])
+
+    def rollback(self, fork_block, head=None):
+        for handler in self.handlers.values():
+            handler.rollback(fork_block + 1)
+        self.update_leaderboard(head)
+        fork_hash = IndexedBlock.objects.get(number=fork_block).hash
+        IndexedBlock.objects.filter(number__gt=fork_block).delete()
+        IndexerCursor.objects.filter(pk__in=[c.pk for c in self.cursors.values()], block_number__gt=fork_block) \
+            .update(block_number=fork_block, block_hash=fork_hash, updated_at=timezone.now())
+        self.load_cursors()
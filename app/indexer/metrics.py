@@ -0,0 +1,49 @@
+import time
+
+from django.core.cache import cache
+
+from talecraft.metrics import metrics
+
+METRICS_KEY = 'indexer:metrics'
+
+
+class IndexerMetrics:
+    """Records the indexer's throughput and lag and publishes a snapshot to the cache every ``interval`` seconds."""
+
+    def __init__(self, name, interval=10):
+        self.name = name
+        self.interval = interval
+        self.published_at = time.monotonic()
+        self.published_counters = {}
+
+    def window(self, blocks, events):
+        metrics.incr('indexer_blocks_total', blocks)
+        metrics.incr('indexer_events_total', events)
+
+    def lag(self, head, last_block, last_timestamp):
+        metrics.set('indexer_last_block', last_block)
+        metrics.set('indexer_head_lag_blocks', head - last_block)
+        metrics.set('indexer_head_lag_seconds', max(0, int(time.time()) - last_timestamp))
+
+    def publish(self, force=False):
+        now = time.monotonic()
+        elapsed = now - self.published_at
+        if not force and elapsed < self.interval:
+            return
+        snapshot = metrics.snapshot()
+        for counter, gauge in (('indexer_blocks_total', 'indexer_blocks_per_second'), ('indexer_events_total', 'indexer_events_per_second')):
+            delta = snapshot['counters'].get(counter, 0) - self.published_counters.get(counter, 0)
+            snapshot['gauges'][gauge] = delta / elapsed if elapsed else 0
+        snapshot['updated_at'] = int(time.time())
+        cache.set(f'{METRICS_KEY}:{self.name}', snapshot, timeout=None)
+        names = cache.get(METRICS_KEY) or []
+        if self.name not in names:
+            cache.set(METRICS_KEY, names + [self.name], timeout=None)
+        self.published_at = now
+        self.published_counters = snapshot['counters']
+
+
+def get_published_metrics():
+    names = cache.get(METRICS_KEY) or []
+    snapshots = cache.get_many([f'{METRICS_KEY}:{name}' for name in names])
+    return {name: snapshots[f'{METRICS_KEY}:{name}'] for name in names if f'{METRICS_KEY}:{name}' in snapshots}
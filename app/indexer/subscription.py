@@ -0,0 +1,71 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+
+import websockets
+
+
+class HeadPolling:
+    """Stand-in for ``HeadSubscription`` when no subscription is used."""
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+
+    def get_head(self):
+        return None
+
+
+class HeadSubscription(threading.Thread):
+    """
+    Listens to ``eth_subscribe('newHeads')`` on a WebSocket endpoint in a background thread,
+    reconnecting after ``reconnect_delay`` seconds whenever the connection drops.
+    """
+
+    def __init__(self, endpoint_uri, reconnect_delay=5):
+        super().__init__(daemon=True)
+        self.endpoint_uri = endpoint_uri
+        self.reconnect_delay = reconnect_delay
+        self.connected = False
+        self.head = None
+        self.new_head = threading.Event()
+
+    def run(self):
+        asyncio.run(self.listen_forever())
+
+    async def listen_forever(self):
+        while True:
+            try:
+                await self.listen()
+            except Exception as e:
+                logging.warning(f'newHeads subscription to {self.endpoint_uri} failed: {e!r}')
+            self.connected = False
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def listen(self):
+        async with websockets.connect(self.endpoint_uri) as ws:
+            await ws.send(json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': 'eth_subscribe', 'params': ['newHeads']}))
+            response = json.loads(await ws.recv())
+            if 'error' in response:
+                raise Exception(response['error'])
+            subscription_id = response['result']
+            self.connected = True
+            logging.warning(f'Subscribed to newHeads on {self.endpoint_uri}')
+            async for message in ws:
+                message = json.loads(message)
+                if message.get('method') == 'eth_subscription' and message['params']['subscription'] == subscription_id:
+                    self.head = int(message['params']['result']['number'], 16)
+                    self.new_head.set()
+
+    def wait(self, timeout):
+        """
+        Blocks until a new head is announced or ``timeout`` seconds pass, so while the subscription
+        is down this degrades to polling every ``timeout`` seconds.
+        """
+        self.new_head.wait(timeout)
+        self.new_head.clear()
+
+    def get_head(self):
+        """Latest announced block number, ``None`` while the subscription is down."""
+        return self.head if self.connected else None
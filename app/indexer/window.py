@@ -0,0 +1,48 @@
+from requests.exceptions import Timeout
+
+# substrings of the errors node implementations return when an eth_getLogs query is too large
+LIMIT_ERRORS = (
+    'too many',
+    'more than',
+    'limit exceeded',
+    'response size',
+    'block range',
+    'timeout',
+    'timed out',
+)
+
+
+def is_limit_error(e):
+    if isinstance(e, Timeout):
+        return True
+    if isinstance(e, ValueError) and e.args:
+        message = e.args[0].get('message', '') if isinstance(e.args[0], dict) else str(e.args[0])
+        return any(s in message.lower() for s in LIMIT_ERRORS)
+    return False
+
+
+class WindowController:
+    """
+    Sizes the block range of each ``eth_getLogs`` query: the window doubles while responses are small
+    and fast, and is halved when a response is dense, slow, or rejected by the node.
+    """
+
+    def __init__(self, size=1000, min_size=1, max_size=10000, target_logs=1000, target_time=2.0):
+        self.size = size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_logs = target_logs
+        self.target_time = target_time
+
+    def succeeded(self, logs_count, elapsed):
+        if logs_count > self.target_logs or elapsed > self.target_time:
+            self.size = max(self.min_size, self.size // 2)
+        elif logs_count < self.target_logs // 4 and elapsed < self.target_time / 4:
+            self.size = min(self.max_size, self.size * 2)
+
+    def failed(self, e):
+        """Shrinks the window if ``e`` means the query was too large. Returns whether it did."""
+        if not is_limit_error(e) or self.size == self.min_size:
+            return False
+        self.size = max(self.min_size, self.size // 2)
+        return True
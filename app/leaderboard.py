@@ -0,0 +1,202 @@
+from datetime import timedelta
+from itertools import chain
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from app.catalog import catalog
+from app.indexer.handlers import ZERO_ADDRESS
+from app.upsert import bulk_upsert, delete_missing
+from app.models import LeaderboardItem, ResourceBalance, PendingCraft, LendingListing, GameLeaderboardItem, GameInfo, \
+    GamePlayer, WeeklyGameLeaderboardItem, IndexerCursor
+from talecraft.crypto import addresses, resource_start_block
+
+# holders which are not players: the zero address, team wallets and the game contracts
+EXCLUDED_ADDRESSES = [
+    '0x0000000000000000000000000000000000000000',
+    '0xF536Cb8037ab72249404f14E507b7b660d052F9D',
+    '0x23BBba252DA45fEac8A22F0497bD2954D67b3cD0',
+    addresses['chest'],
+    addresses['marketplace'],
+    addresses['games']['0'],
+    addresses['games']['1'],
+    addresses['games']['2'],
+    addresses['lending'],
+]
+
+LEADERBOARD_FIELDS = 'weight', 'max_tier', 'tier0', 'tier1', 'tier2', 'tier3', 'tier4', 'tier5',
+TIERS = 6
+
+# the leaderboards are computed from the index while the streams they need are at most this many blocks behind
+INDEX_MAX_LAG = 150
+# an indexer which has not updated the global leaderboard for this long is no longer maintaining it
+MAINTAINED_AGE = timedelta(minutes=2)
+
+# the weekly game leaderboards restart on Fridays at 17:00 UTC
+GAME_WEEK_START_WEEKDAY = 4
+GAME_WEEK_START_HOUR = 17
+
+
+def holdings_matrix(held, size):
+    """Players of ``held`` and a players × token ids matrix of the amounts they hold, token ids >= ``size`` are dropped."""
+    players = list(held)
+    counts = [len(items) for items in held.values()]
+    pairs = np.fromiter(chain.from_iterable(chain.from_iterable(held.values())), dtype=np.int64, count=2 * sum(counts))
+    tids, amounts = pairs.reshape(-1, 2).T
+    rows = np.repeat(np.arange(len(players)), counts)
+    kept = (tids >= 0) & (tids < size) & (amounts > 0)
+    matrix = np.zeros((len(players), size), dtype=np.int64)
+    np.add.at(matrix, (rows[kept], tids[kept]), amounts[kept])
+    return players, matrix
+
+
+def aggregate(matrix, weights, tiers):
+    """Weight, highest tier and players × tiers weights of each row of a ``holdings_matrix()``."""
+    # token ids 1-4 are the base elements and are not counted
+    counted = np.arange(len(weights)) > 4
+    contributions = matrix * np.where(counted, weights, 0)
+    tier_weights = contributions @ (tiers[:, np.newaxis] == np.arange(TIERS)).astype(np.int64)
+    max_tier = np.where((matrix > 0) & counted, tiers, 0).max(axis=1, initial=0)
+    return contributions.sum(axis=1), max_tier, tier_weights
+
+
+def compute_weights(held, weights=None):
+    """
+    Values of ``LEADERBOARD_FIELDS`` of each player from ``held``,
+    a mapping of players to the ``(token_id, amount)`` pairs they hold.
+
+    ``weights`` (indexed by token id) replaces the catalog weights, e.g. to preview a rebalance.
+    """
+    catalog.refresh()
+    weights = catalog.weights if weights is None else np.asarray(weights, dtype=np.int64)
+    players, matrix = holdings_matrix(held, len(catalog.tiers))
+    weight, max_tier, tier_weights = aggregate(matrix, weights, catalog.tiers)
+    return dict(zip(players, np.column_stack((weight, max_tier, tier_weights)).tolist()))
+
+
+def indexed_holdings(players):
+    """Balances, pending crafts and resources held by the lending contract on their behalf, of ``players``."""
+    held = {player: [] for player in players}
+    for address, token_id, balance in ResourceBalance.objects.filter(address__in=players, balance__gt=0) \
+            .values_list('address', 'token_id', 'balance'):
+        held[address].append((token_id, balance))
+    for player, token_id in PendingCraft.objects.filter(player__in=players, claimed_block__isnull=True) \
+            .values_list('player', 'token_id'):
+        held[player].append((token_id, 1))
+    for lender, token_id in LendingListing.objects.filter(lender__in=players, closed=False, resource__isnull=False) \
+            .values_list('lender', 'resource__token_id'):
+        held[lender].append((token_id, 1))
+    return held
+
+
+def index_is_live(cursors, head):
+    """
+    Whether the global leaderboard can be computed from the index: among ``cursors``, the resources and lending ones
+    are at most ``INDEX_MAX_LAG`` blocks behind ``head``, and the resources stream holds the whole history of balances.
+    """
+    cursors = {cursor.stream: cursor for cursor in cursors if cursor.stream in ('resources', 'lending')}
+    if len(cursors) < 2 or cursors['resources'].start_block is None or cursors['resources'].start_block > resource_start_block():
+        return False
+    return all(head - cursor.block_number <= INDEX_MAX_LAG for cursor in cursors.values())
+
+
+def is_maintained():
+    """Whether an indexer process has lately updated the global leaderboard weights of the players its events touched."""
+    return IndexerCursor.objects.filter(stream='resources', leaderboard_updated_at__gt=timezone.now() - MAINTAINED_AGE).exists()
+
+
+def save_weights(weights, replace=False):
+    """
+    Upserts ``compute_weights()`` results into ``LeaderboardItem``. With ``replace``, ``weights`` is the whole
+    leaderboard and the rows of other players are deleted in the same transaction.
+    """
+    players = sorted(set(weights) - set(EXCLUDED_ADDRESSES))
+    with transaction.atomic():
+        bulk_upsert(LeaderboardItem, [{'address': player, **dict(zip(LEADERBOARD_FIELDS, weights[player]))} for player in players],
+                    ['address'], LEADERBOARD_FIELDS)
+        if replace:
+            delete_missing(LeaderboardItem.objects.all(), 'address', players)
+
+
+def update_players(players):
+    """Recomputes the ``LeaderboardItem`` of ``players`` from the index."""
+    players = set(players) - set(EXCLUDED_ADDRESSES)
+    if players:
+        save_weights(compute_weights(indexed_holdings(players)))
+
+
+def rebuild(chunk_size=500):
+    """Recomputes the whole leaderboard from the index, e.g. after resource weights have changed."""
+    players = set(ResourceBalance.objects.values_list('address', flat=True).distinct())
+    players |= set(PendingCraft.objects.filter(claimed_block__isnull=True).values_list('player', flat=True))
+    players |= set(LendingListing.objects.filter(closed=False).values_list('lender', flat=True))
+    players = sorted(players - set(EXCLUDED_ADDRESSES))
+    with transaction.atomic():
+        for offset in range(0, len(players), chunk_size):
+            update_players(players[offset:offset + chunk_size])
+        delete_missing(LeaderboardItem.objects.all(), 'address', players)
+
+
+def save_game_leaderboard(league, scores):
+    """Replaces the ``GameLeaderboardItem`` of ``league`` by ``scores``, a mapping of players to ``(wins, played)``."""
+    with transaction.atomic():
+        bulk_upsert(GameLeaderboardItem, [{'league': league, 'address': player, '_wins': wins, '_played': played}
+                                          for player, (wins, played) in sorted(scores.items())],
+                    ['league', 'address'], ['_wins', '_played'])
+        delete_missing(GameLeaderboardItem.objects.filter(league=league), 'address', scores)
+
+
+def update_game_leaderboards(leagues):
+    """Recomputes wins and played games of the ``GameLeaderboardItem`` of ``leagues`` from the indexed games."""
+    for league in leagues:
+        # games a player left are not counted, like ``playerGames()`` of the contract
+        played = dict(GamePlayer.objects.filter(game__league=league, left_block__isnull=True, address__isnull=False)
+                      .values_list('address').annotate(Count('id')).order_by())
+        # a draw finishes the game without a winner
+        wins = dict(GameInfo.objects.filter(league=league, finished=True, winner__isnull=False)
+                    .exclude(winner=ZERO_ADDRESS).values_list('winner').annotate(Count('id')).order_by())
+        save_game_leaderboard(league, {player: (wins.get(player, 0), played.get(player, 0))
+                                       for player in set(played) | set(wins)})
+
+
+def update_ranks(queryset, score):
+    """Stores in ``rank`` the position of the rows of ``queryset`` by descending ``score``, equal scores share a rank."""
+    rows = queryset.annotate(score=score).order_by('-score').values_list('pk', 'score', 'rank')
+    changed = []
+    rank, last_score = 0, None
+    for position, (pk, score, stored_rank) in enumerate(rows.iterator(), 1):
+        if score != last_score:
+            rank, last_score = position, score
+        if rank != stored_rank:
+            changed.append(queryset.model(pk=pk, rank=rank))
+    queryset.model.objects.bulk_update(changed, ['rank'], batch_size=1000)
+
+
+def rank_leaderboard():
+    update_ranks(LeaderboardItem.objects.all(), F('weight'))
+
+
+def game_week(moment):
+    """Day the weekly game leaderboards containing ``moment`` (UTC) started on."""
+    start = moment - timedelta(hours=GAME_WEEK_START_HOUR)
+    return (start - timedelta(days=(start.weekday() - GAME_WEEK_START_WEEKDAY) % 7)).date()
+
+
+def save_weekly_game_leaderboards(week, leagues):
+    """Snapshots the games since the last weekly reset into the ``WeeklyGameLeaderboardItem`` of ``week`` and ranks them."""
+    for league in leagues:
+        scores = {
+            player: (max(wins, 0), max(played, 0))
+            for player, wins, played in GameLeaderboardItem.objects.filter(league=league)
+            .annotate(weekly_wins=F('_wins') - F('_wins_offset'), weekly_played=F('_played') - F('_played_offset'))
+            .exclude(weekly_wins=0, weekly_played=0).values_list('address', 'weekly_wins', 'weekly_played')
+        }
+        items = WeeklyGameLeaderboardItem.objects.filter(week=week, league=league)
+        with transaction.atomic():
+            bulk_upsert(WeeklyGameLeaderboardItem, [{'week': week, 'league': league, 'address': player, 'wins': wins, 'played': played}
+                                                    for player, (wins, played) in sorted(scores.items())],
+                        ['week', 'league', 'address'], ['wins', 'played'])
+            delete_missing(items, 'address', scores)
+        update_ranks(items, F('wins'))
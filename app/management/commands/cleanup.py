@@ -1,9 +1,12 @@
 from django.core.management import BaseCommand
 
-from app.models import MarketplaceListing, internal_options
+from app.models import MarketplaceListing, IndexerCursor
+from app.response_cache import bump_version
 
 
 class Command(BaseCommand):
     def handle(self, *args, **options):
         MarketplaceListing.objects.all().delete()
-        internal_options.marketplace_last_block = None
+        bump_version(MarketplaceListing)
+        # the indexer will index the marketplace history again, on its own range while the other streams stay live
+        IndexerCursor.objects.filter(stream='marketplace').delete()
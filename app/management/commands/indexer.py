@@ -0,0 +1,160 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from talecraft.crypto import web3, ETH_WS_RPC
+from talecraft.metrics import metrics
+from app.indexer import Indexer, IndexerMetrics, WindowController, HeadSubscription, HeadPolling, backfill, default_handlers
+from app.models import internal_options as io, IndexerCursor
+
+# a cursor saved more recently than this is being advanced by another indexer process
+ACTIVE_CURSOR_AGE = timedelta(minutes=2)
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', nargs=2, type=int, metavar=('FROM', 'TO'),
+                            help='Index the given block range in parallel and exit')
+        parser.add_argument('--reset', action='store_true',
+                            help='Revert what the streams indexed since FROM and index it again, instead of resuming from their cursors')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--streams', type=lambda value: value.split(','),
+                            help='Comma separated streams to index (marketplace, lending, games, tournaments, resources), all by default')
+        parser.add_argument('--confirmations', type=int, default=settings.INDEXER_CONFIRMATIONS,
+                            help='How many blocks to stay behind the head')
+        parser.add_argument('--subscribe', action='store_true',
+                            help='Wake up on newHeads notifications instead of polling every 5 seconds')
+        parser.add_argument('--ws-endpoint', default=ETH_WS_RPC)
+
+    def handle(self, *args, **options):
+        logging.getLogger('app.indexer.events').disabled = options['verbosity'] < 2
+        if options['streams']:
+            known = {h.stream for h in default_handlers()}
+            unknown = [stream for stream in options['streams'] if stream not in known]
+            if unknown:
+                raise CommandError(f'Unknown streams: {", ".join(unknown)} (expected some of {", ".join(sorted(known))})')
+        indexer = Indexer(default_handlers(options['streams']))
+        stats = IndexerMetrics(','.join(options['streams'] or ['all']))
+
+        if options['backfill']:
+            return self.backfill(indexer, stats, *options['backfill'], workers=options['workers'], reset=options['reset'])
+
+        window = WindowController()
+        if options['subscribe']:
+            heads = HeadSubscription(options['ws_endpoint'])
+            heads.start()
+        else:
+            heads = HeadPolling()
+
+        while True:
+            try:
+                chain_head = heads.get_head() or web3.eth.block_number
+                head = chain_head - options['confirmations']
+                if not indexer.load_cursors():
+                    # streams which were added or reset index their whole history
+                    indexer.init_cursors(start_blocks=self.legacy_blocks())
+
+                # streams far behind the others catch up on their own range instead of holding back the live window
+                groups = indexer.split(window.size)
+                caught_up = True
+                for i, group in enumerate(groups):
+                    caught_up &= self.index(group, window, stats, chain_head, head, leading=i == 0, label=len(groups) > 1)
+                if not caught_up:
+                    # still catching up, don't wait for new blocks
+                    continue
+
+            except KeyboardInterrupt:
+                logging.warning('Stopping...')
+                return
+            except Exception as e:
+                if window.failed(e):
+                    logging.warning('  Query rejected ({}), shrinking window to {} blocks'.format(e, window.size))
+                    continue
+                logging.exception(e)
+                time.sleep(5)
+
+            heads.wait(5)
+
+    def index(self, indexer, window, stats, chain_head, head, leading=True, label=False):
+        """Indexes the next window of ``indexer``'s streams. Returns whether they have reached ``head``."""
+        last_block = indexer.last_block
+        if last_block >= head:
+            return True
+        prefix = '[{}] '.format(', '.join(indexer.streams)) if label else ''
+        logging.warning('{}Last remembered block: {}, current last: {}'.format(prefix, last_block, head))
+        to_block = min(head, last_block + window.size)
+        from_block = last_block + 1
+
+        fork_block = indexer.find_fork()
+        if fork_block is not None:
+            logging.warning('  Chain reorganization detected, rolling back to block {}'.format(fork_block))
+            with transaction.atomic():
+                indexer.rollback(fork_block, head=chain_head)
+            return False
+
+        logging.warning('  Checking blocks {} ~ {}'.format(from_block, to_block))
+
+        started = time.monotonic()
+        logs = indexer.get_logs(from_block, to_block)
+        window.succeeded(len(logs), time.monotonic() - started)
+        events = indexer.decode(logs)
+        indexer.prepare(events)
+        block_hash, block_timestamp = indexer.get_block_header(to_block)
+
+        with metrics.timer('indexer_apply_seconds'), transaction.atomic():
+            indexer.apply(events, head=chain_head)
+            indexer.checkpoint(to_block, block_hash)
+
+        stats.window(to_block - from_block + 1, len(events))
+        if leading:
+            stats.lag(chain_head, to_block, block_timestamp)
+        stats.publish(force=to_block >= head)
+        return to_block >= head
+
+    def legacy_blocks(self):
+        if IndexerCursor.objects.exists():
+            return {}
+        # first run, each stream continues from the position of its former per-contract tracker
+        legacy = {'marketplace': io.marketplace_last_block, 'lending': io.lending_last_block, 'games': io.games_last_block}
+        return {stream: block for stream, block in legacy.items() if block}
+
+    def backfill(self, indexer, stats, from_block, to_block, workers, reset=False):
+        indexer.load_cursors()
+        active = sorted({c.stream for c in indexer.cursors.values() if c.updated_at > timezone.now() - ACTIVE_CURSOR_AGE})
+        if active:
+            raise CommandError(f'Streams {", ".join(active)} are being indexed by another process, stop it before the backfill')
+        if len(indexer.cursors) < len(indexer.handlers):
+            indexer.init_cursors(from_block - 1)
+        if reset:
+            errors = indexer.check_reset(from_block)
+            if errors:
+                raise CommandError('\n'.join(errors))
+            logging.warning('Reverting the blocks since {}'.format(from_block))
+            with transaction.atomic():
+                indexer.reset(from_block)
+        if indexer.last_block < from_block - 1:
+            raise CommandError(f'Streams are indexed up to block {indexer.last_block} only, backfill from block {indexer.last_block + 1}')
+        if indexer.last_block >= to_block:
+            logging.warning('Streams are indexed up to block {} already, use --reset to index the range again'.format(indexer.last_block))
+            return
+        if indexer.last_block >= from_block:
+            logging.warning('Resuming backfill after block {}'.format(indexer.last_block))
+            from_block = indexer.last_block + 1
+
+        for start, end, events in backfill(indexer, from_block, to_block, workers=workers):
+            logging.warning('  Applying blocks {} ~ {}: {} events'.format(start, end, len(events)))
+            indexer.prepare(events)
+            block_hash = indexer.get_block_hash(end)
+            with metrics.timer('indexer_apply_seconds'), transaction.atomic():
+                indexer.apply(events)
+                indexer.save_cursors(end, block_hash)
+            stats.window(end - start + 1, len(events))
+            stats.publish()
+
+        stats.publish(force=True)
+        logging.warning('Backfill finished')
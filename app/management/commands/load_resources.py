@@ -4,6 +4,7 @@ from django.core.management import BaseCommand
 from django.db import transaction
 from web3 import HTTPProvider, Web3
 
+from app.catalog import bump_catalog_version
 from app.models import Resource
 from talecraft.settings import BASE_DIR
 
@@ -34,5 +35,6 @@ class Command(BaseCommand):
             resource_objs.append(zid)
 
             Resource.objects.exclude(token_id__in=[r.token_id for r in resource_objs]).delete()
+        bump_catalog_version()
 
         print('Done')
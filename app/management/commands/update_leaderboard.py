@@ -1,111 +1,115 @@
 import logging
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import reduce
+from operator import or_
 from time import sleep
 
 from django.core.management import BaseCommand
-from django.db.models import F
+from django.db.models import F, Q
 
-from app.models import internal_options as io, Resource, LeaderboardItem, GameLeaderboardItem
-from talecraft.crypto import addresses, resource, marketplace, games, lending
+from app.catalog import catalog
+from app.leaderboard import EXCLUDED_ADDRESSES, INDEX_MAX_LAG, compute_weights, save_weights, rebuild as rebuild_leaderboard, \
+    save_game_leaderboard, update_game_leaderboards, rank_leaderboard, game_week, save_weekly_game_leaderboards, \
+    is_maintained as leaderboard_is_maintained
+from app.models import internal_options as io, GameLeaderboardItem, IndexerCursor
+from talecraft.crypto import web3, resource, games, lending
+from talecraft.multicall import batch_call
 
+# players whose balances, crafts and listings are fetched together, in a few batched requests
+PLAYERS_CHUNK_SIZE = 200
 
-class Command(BaseCommand):
-    def handle(self, *args, **options):
-        resources = {
-            r.token_id: (r.weight, r.tier)
-            for r in Resource.objects.exclude(token_id=0).order_by('token_id')
-        }
 
-        exclude_addresses = [
-            '0x0000000000000000000000000000000000000000',
-            '0xF536Cb8037ab72249404f14E507b7b660d052F9D',
-            '0x23BBba252DA45fEac8A22F0497bD2954D67b3cD0',
-            addresses['chest'],
-            addresses['marketplace'],
-            addresses['games']['0'],
-            addresses['games']['1'],
-            addresses['games']['2'],
-            addresses['lending'],
-        ]
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Player chunks fetched concurrently by the RPC sweep')
 
+    def handle(self, *args, **options):
+        rebuilt_version = None
         while True:
             logging.warning('Leaderboard update started')
+            catalog.refresh()
             logging.warning('  Global leaderboard')
-            logging.warning('    Fetching players list...')
-            players = resource.functions.getPlayers().call()
-            for i, player in enumerate(players):
-                logging.warning(f'    Player {i+1}/{len(players)}: {player}')
-                if player in exclude_addresses:
-                    continue
-                logging.warning('      Fetching balances...')
-                balances = resource.functions.balanceOfBatch([player] * len(resources), list(range(1, len(resources) + 1))).call()
-                weight = 0
-                max_tier = 0
-                tier_weights = [0, 0, 0, 0, 0, 0]
-                for tid, balance in enumerate(balances, 1):
-                    if tid <= 4:
-                        continue
-                    weight += balance * resources[tid][0]
-                    tier_weights[resources[tid][1]] += balance * resources[tid][0]
-                    if balance > 0:
-                        max_tier = max(max_tier, resources[tid][1])
-                # marketplace_balances = marketplace.functions.getLockedTokens(player).call()
-                # for tid, amount, *_ in marketplace_balances:
-                #     if tid <= 4:
-                #         continue
-                #     weight += amount * resources[tid][0]
-                #     tier_weights[resources[tid][1]] += amount * resources[tid][0]
-                #     if amount > 0:
-                #         max_tier = max(max_tier, resources[tid][1])
-                logging.warning('      Fetching crafts...')
-                pending_crafts = resource.functions.getCrafts(resource.functions.pendingCrafts(player).call()).call()
-                for tid, *_ in pending_crafts:
-                    if tid <= 4:
-                        continue
-                    weight += resources[tid][0]
-                    tier_weights[resources[tid][1]] += resources[tid][0]
-                    max_tier = max(max_tier, resources[tid][1])
-                logging.warning('      Fetching lending...')
-                listing_ids = lending.functions.getLenderHeldListings(player).call()
-                listings = lending.functions.getListings(listing_ids).call()
-                for lid, dur, pr, tid, *_ in listings:
-                    if tid <= 4:
-                        continue
-                    weight += resources[tid][0]
-                    tier_weights[resources[tid][1]] += resources[tid][0]
-                    max_tier = max(max_tier, resources[tid][1])
-
-                logging.warning('      Saving...')
-                LeaderboardItem.objects.update_or_create(address=player,
-                                                         defaults={'weight': weight, 'max_tier': max_tier,
-                                                                   'tier0': tier_weights[0],
-                                                                   'tier1': tier_weights[1],
-                                                                   'tier2': tier_weights[2],
-                                                                   'tier3': tier_weights[3],
-                                                                   'tier4': tier_weights[4],
-                                                                   'tier5': tier_weights[5]})
-            LeaderboardItem.objects.filter(address__in=exclude_addresses).delete()
+            if leaderboard_is_maintained():
+                # an indexer updates the players touched by new events, the whole board only needs
+                # to be recomputed when resource weights change
+                if rebuilt_version != catalog.version:
+                    logging.warning('    Rebuilding from the index...')
+                    rebuild_leaderboard()
+                    rebuilt_version = catalog.version
+                else:
+                    logging.warning('    Kept up to date by the indexer')
+            else:
+                rebuilt_version = None
+                self.sweep(options['workers'])
+            rank_leaderboard()
             logging.warning('Global leaderboards updated')
 
             now = datetime.utcnow()
-            if not io.last_game_leaderboards_reset or io.last_game_leaderboards_reset < now - timedelta(2):
-                if now.weekday() == 4 and now.hour >= 17:
-                    GameLeaderboardItem.objects.update(_wins_offset=F('_wins'), _played_offset=F('_played'))
-                    io.last_game_leaderboards_reset = now
-                    logging.warning('Game leaderboards reset')
+            week = game_week(now)
+            if not io.last_game_leaderboards_reset or game_week(io.last_game_leaderboards_reset) != week:
+                # the board of the past week was snapshotted by the previous run, count from its totals
+                GameLeaderboardItem.objects.update(_wins_offset=F('_wins'), _played_offset=F('_played'))
+                io.last_game_leaderboards_reset = now
+                logging.warning('Game leaderboards reset')
 
-            for i, league in enumerate(games.keys()):
-                leaderboard = {
-                    player: wins for player, wins in games[league].functions.leaderboard().call()
-                }
-                for evt in games[league].events.PlayerEntered().getLogs(fromBlock=8521077, toBlock='latest'):
-                    leaderboard.setdefault(evt.args.player, 0)
-                for player, wins in leaderboard.items():
-                    played = len(games[league].functions.playerGames(player).call())
-                    if played == 0 and wins == 0:
-                        continue
-                    GameLeaderboardItem.objects.update_or_create(address=player, league=i, defaults={'_wins': wins, '_played': played})
+            if self.index_is_live(*((contract, 'games') for contract in games.values())):
+                update_game_leaderboards(range(len(games)))
+            else:
+                self.scan_games()
+            save_weekly_game_leaderboards(week, range(len(games)))
 
             logging.warning('Game leaderboards updated')
 
             sleep(60)
+
+    def cursors(self, *streams):
+        return list(IndexerCursor.objects.filter(reduce(or_, (Q(contract=contract.address, stream=stream) for contract, stream in streams))))
+
+    def index_is_live(self, *streams):
+        head = web3.eth.block_number
+        cursors = self.cursors(*streams)
+        return len(cursors) == len(streams) and all(head - cursor.block_number <= INDEX_MAX_LAG for cursor in cursors)
+
+    def sweep(self, workers):
+        logging.warning('    Fetching players list...')
+        players = [player for player in resource.functions.getPlayers().call() if player not in EXCLUDED_ADDRESSES]
+        chunks = [players[offset:offset + PLAYERS_CHUNK_SIZE] for offset in range(0, len(players), PLAYERS_CHUNK_SIZE)]
+        logging.warning(f'    Fetching balances, crafts and lending of {len(players)} players in {len(chunks)} chunks...')
+        held = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for i, chunk_held in enumerate(executor.map(self.fetch_holdings, chunks)):
+                held.update(chunk_held)
+                logging.warning(f'      Chunk {i+1}/{len(chunks)} fetched')
+        logging.warning('    Saving...')
+        save_weights(compute_weights(held), replace=True)
+
+    def scan_games(self):
+        logging.warning('  Game leaderboards are scanned from the node, the games index is behind')
+        for i, league in enumerate(games.keys()):
+            leaderboard = {
+                player: wins for player, wins in games[league].functions.leaderboard().call()
+            }
+            for evt in games[league].events.PlayerEntered().getLogs(fromBlock=8521077, toBlock='latest'):
+                leaderboard.setdefault(evt.args.player, 0)
+            played_games = batch_call([games[league].functions.playerGames(player) for player in leaderboard])
+            save_game_leaderboard(i, {
+                player: (wins, len(player_games))
+                for (player, wins), player_games in zip(leaderboard.items(), played_games)
+                if wins or player_games
+            })
+
+    def fetch_holdings(self, players):
+        token_ids = catalog.token_ids
+        all_balances = batch_call([resource.functions.balanceOfBatch([player] * len(token_ids), token_ids) for player in players])
+        all_craft_ids = batch_call([resource.functions.pendingCrafts(player) for player in players])
+        all_held_listings = batch_call([lending.functions.getLenderHeldListings(player) for player in players])
+        all_pending_crafts = batch_call([resource.functions.getCrafts(craft_ids) for craft_ids in all_craft_ids])
+        all_listings = batch_call([lending.functions.getListings(listing_ids) for listing_ids in all_held_listings])
+        held = {}
+        for player, balances, pending_crafts, listings in zip(players, all_balances, all_pending_crafts, all_listings):
+            # marketplace.functions.getLockedTokens(player) is not counted
+            held[player] = [*zip(token_ids, balances),
+                            *((tid, 1) for tid, *_ in pending_crafts),
+                            *((tid, 1) for lid, dur, pr, tid, *_ in listings)]
+        return held
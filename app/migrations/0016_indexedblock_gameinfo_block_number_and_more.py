@@ -0,0 +1,71 @@
+# Generated by Django 4.0.10 on 2026-10-18 06:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_alter_gameleaderboarditem__played_offset_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexedBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveBigIntegerField(unique=True)),
+                ('hash', models.CharField(max_length=66)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='gameinfo',
+            name='block_number',
+            field=models.PositiveBigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gameinfo',
+            name='finished_block',
+            field=models.PositiveBigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gameinfo',
+            name='started_block',
+            field=models.PositiveBigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gameplayer',
+            name='block_number',
+            field=models.PositiveBigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gameplayer',
+            name='left_block',
+            field=models.PositiveBigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='lendinglisting',
+            name='block_number',
+            field=models.PositiveBigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='lendinglisting',
+            name='closed_block',
+            field=models.PositiveBigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='lendinglisting',
+            name='started_block',
+            field=models.PositiveBigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='marketplacelisting',
+            name='block_number',
+            field=models.PositiveBigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='marketplacelisting',
+            name='closed_block',
+            field=models.PositiveBigIntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
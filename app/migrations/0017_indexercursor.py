@@ -0,0 +1,27 @@
+# Generated by Django 4.0.10 on 2026-10-18 06:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_indexedblock_gameinfo_block_number_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexerCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contract', models.CharField(max_length=64)),
+                ('stream', models.CharField(max_length=32)),
+                ('block_number', models.PositiveBigIntegerField()),
+                ('block_hash', models.CharField(blank=True, max_length=66)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('contract', 'stream')},
+            },
+        ),
+    ]
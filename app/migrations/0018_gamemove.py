@@ -0,0 +1,33 @@
+# Generated by Django 4.0.10 on 2026-10-18 07:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_indexercursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameMove',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('player', models.CharField(max_length=64)),
+                ('kind', models.PositiveSmallIntegerField(choices=[(0, 'Card'), (1, 'Power')])),
+                ('round', models.PositiveSmallIntegerField()),
+                ('token_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('power_type', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('power_value', models.PositiveIntegerField(blank=True, null=True)),
+                ('block_number', models.PositiveBigIntegerField(db_index=True)),
+                ('log_index', models.PositiveIntegerField()),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='moves', to='app.gameinfo')),
+            ],
+            options={
+                'unique_together': {('block_number', 'log_index')},
+                'index_together': {('game', 'block_number', 'log_index')},
+            },
+        ),
+    ]
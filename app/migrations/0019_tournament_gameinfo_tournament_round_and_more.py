@@ -0,0 +1,53 @@
+# Generated by Django 4.0.10 on 2026-10-18 07:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0018_gamemove'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tournament',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tournament_id', models.PositiveIntegerField(unique=True)),
+                ('players_count', models.PositiveSmallIntegerField()),
+                ('start_time', models.DateTimeField(blank=True, null=True)),
+                ('join_deadline', models.DateTimeField(blank=True, null=True)),
+                ('winner', models.CharField(blank=True, max_length=64, null=True)),
+                ('started', models.BooleanField(db_index=True, default=False)),
+                ('finished', models.BooleanField(db_index=True, default=False)),
+                ('block_number', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('started_block', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('finished_block', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='gameinfo',
+            name='tournament_round',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gameinfo',
+            name='tournament',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='games', to='app.tournament'),
+        ),
+        migrations.CreateModel(
+            name='TournamentPlayer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(db_index=True, max_length=64)),
+                ('block_number', models.PositiveBigIntegerField(db_index=True)),
+                ('log_index', models.PositiveIntegerField()),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='players', to='app.tournament')),
+            ],
+            options={
+                'unique_together': {('tournament', 'address')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.0.10 on 2026-10-18 07:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0019_tournament_gameinfo_tournament_round_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceBalanceChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(max_length=64)),
+                ('token_id', models.PositiveBigIntegerField()),
+                ('delta', models.BigIntegerField()),
+                ('block_number', models.PositiveBigIntegerField(db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResourceBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(max_length=64)),
+                ('token_id', models.PositiveBigIntegerField(db_index=True)),
+                ('balance', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('address', 'token_id')},
+            },
+        ),
+    ]
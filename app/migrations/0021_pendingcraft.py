@@ -0,0 +1,24 @@
+# Generated by Django 4.0.10 on 2026-10-18 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0020_resourcebalancechange_resourcebalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingCraft',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('craft_id', models.PositiveBigIntegerField(unique=True)),
+                ('player', models.CharField(db_index=True, max_length=64)),
+                ('token_id', models.PositiveBigIntegerField()),
+                ('block_number', models.PositiveBigIntegerField(db_index=True)),
+                ('claimed_block', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.0.10 on 2026-10-18 07:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0021_pendingcraft'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameleaderboarditem',
+            name='rank',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='leaderboarditem',
+            name='rank',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='gameleaderboarditem',
+            name='address',
+            field=models.CharField(db_index=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='leaderboarditem',
+            name='address',
+            field=models.CharField(db_index=True, max_length=64),
+        ),
+        migrations.AlterIndexTogether(
+            name='gameleaderboarditem',
+            index_together={('league', 'rank')},
+        ),
+    ]
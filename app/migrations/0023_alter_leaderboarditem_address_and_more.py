@@ -0,0 +1,39 @@
+# Generated by Django 4.0.10 on 2026-10-18 07:24
+
+from django.db import migrations, models
+from django.db.models import Max, Count
+
+
+def forward_func(apps, schema_editor):
+    # update_or_create could race into duplicate rows, keep the latest one of each player
+    db_alias = schema_editor.connection.alias
+    for model, key in ('LeaderboardItem', ['address']), ('GameLeaderboardItem', ['league', 'address']):
+        Model = apps.get_model('app', model)
+        duplicates = Model.objects.using(db_alias).values(*key).annotate(last_id=Max('id'), count=Count('id')).filter(count__gt=1)
+        for duplicate in duplicates:
+            Model.objects.using(db_alias).filter(**{field: duplicate[field] for field in key}) \
+                .exclude(id=duplicate['last_id']).delete()
+
+
+def reverse_func(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0022_gameleaderboarditem_rank_leaderboarditem_rank_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(forward_func, reverse_func),
+        migrations.AlterField(
+            model_name='leaderboarditem',
+            name='address',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='gameleaderboarditem',
+            unique_together={('league', 'address')},
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.0.10 on 2026-10-18 07:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0023_alter_leaderboarditem_address_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='gameleaderboarditem',
+            index_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='gameleaderboarditem',
+            name='address',
+            field=models.CharField(max_length=64),
+        ),
+        migrations.CreateModel(
+            name='WeeklyGameLeaderboardItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField()),
+                ('league', models.PositiveSmallIntegerField()),
+                ('address', models.CharField(max_length=64)),
+                ('played', models.PositiveIntegerField()),
+                ('wins', models.PositiveIntegerField()),
+                ('rank', models.PositiveIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'unique_together': {('week', 'league', 'address')},
+                'index_together': {('week', 'league', 'rank')},
+            },
+        ),
+        migrations.RemoveField(
+            model_name='gameleaderboarditem',
+            name='rank',
+        ),
+    ]
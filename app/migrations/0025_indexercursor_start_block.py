@@ -0,0 +1,18 @@
+# Generated by Django 4.0.10 on 2026-10-18 07:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0024_alter_gameleaderboarditem_index_together_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='indexercursor',
+            name='start_block',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
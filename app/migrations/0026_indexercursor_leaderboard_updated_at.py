@@ -0,0 +1,18 @@
+# Generated by Django 4.0.10 on 2026-10-18 08:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0025_indexercursor_start_block'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='indexercursor',
+            name='leaderboard_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -27,6 +27,8 @@ class MarketplaceListing(models.Model):
     buyer = models.CharField(max_length=64, null=True, blank=True)
     closed = models.BooleanField(default=False, db_index=True)
     closed_at = models.DateTimeField(db_index=True, null=True, blank=True)
+    block_number = models.PositiveBigIntegerField(db_index=True, null=True, blank=True)
+    closed_block = models.PositiveBigIntegerField(db_index=True, null=True, blank=True)
 
 
 class LendingListing(models.Model):
@@ -39,10 +41,13 @@ class LendingListing(models.Model):
     started = models.DateTimeField(null=True, blank=True)
     closed = models.BooleanField(default=False, db_index=True)
     closed_at = models.DateTimeField(db_index=True, null=True, blank=True)
+    block_number = models.PositiveBigIntegerField(db_index=True, null=True, blank=True)
+    started_block = models.PositiveBigIntegerField(db_index=True, null=True, blank=True)
+    closed_block = models.PositiveBigIntegerField(db_index=True, null=True, blank=True)
 
 
 class LeaderboardItem(models.Model):
-    address = models.CharField(max_length=64)
+    address = models.CharField(max_length=64, unique=True)
     weight = models.PositiveIntegerField()
     max_tier = models.PositiveSmallIntegerField()
     tier0 = models.PositiveIntegerField(default=0)
@@ -51,6 +56,8 @@ class LeaderboardItem(models.Model):
     tier3 = models.PositiveIntegerField(default=0)
     tier4 = models.PositiveIntegerField(default=0)
     tier5 = models.PositiveIntegerField(default=0)
+    # position by weight, refreshed by update_leaderboard; players sharing a weight share a rank
+    rank = models.PositiveIntegerField(null=True, blank=True, db_index=True)
 
 
 class GameLeaderboardItem(models.Model):
@@ -61,6 +68,9 @@ class GameLeaderboardItem(models.Model):
     _played_offset = models.IntegerField(default=0)
     _wins_offset = models.IntegerField(default=0)
 
+    class Meta:
+        unique_together = 'league', 'address',
+
     @property
     def played(self):
         return self._played - self._played_offset
@@ -70,6 +80,21 @@ class GameLeaderboardItem(models.Model):
         return self._wins - self._wins_offset
 
 
+class WeeklyGameLeaderboardItem(models.Model):
+    """Games of a player in a league during a week, the weeks start on Fridays at 17:00 UTC."""
+    week = models.DateField()
+    league = models.PositiveSmallIntegerField()
+    address = models.CharField(max_length=64)
+    played = models.PositiveIntegerField()
+    wins = models.PositiveIntegerField()
+    # position in the league by wins, equal wins share a rank
+    rank = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        unique_together = 'week', 'league', 'address',
+        index_together = 'week', 'league', 'rank',
+
+
 class GameChat(models.Model):
     chat_id = models.CharField(max_length=16, db_index=True)
 
@@ -81,16 +106,115 @@ class GameChatMessage(models.Model):
     text = models.TextField()
 
 
+class Tournament(models.Model):
+    tournament_id = models.PositiveIntegerField(unique=True)
+    players_count = models.PositiveSmallIntegerField()
+    start_time = models.DateTimeField(null=True, blank=True)
+    join_deadline = models.DateTimeField(null=True, blank=True)
+    winner = models.CharField(max_length=64, null=True, blank=True)
+    started = models.BooleanField(default=False, db_index=True)
+    finished = models.BooleanField(default=False, db_index=True)
+    block_number = models.PositiveBigIntegerField(db_index=True, null=True, blank=True)
+    started_block = models.PositiveBigIntegerField(db_index=True, null=True, blank=True)
+    finished_block = models.PositiveBigIntegerField(db_index=True, null=True, blank=True)
+
+
+class TournamentPlayer(models.Model):
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='players')
+    address = models.CharField(max_length=64, db_index=True)
+    block_number = models.PositiveBigIntegerField(db_index=True)
+    log_index = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = 'tournament', 'address',
+
+
 class GameInfo(models.Model):
+    # league of the games of the tournament contract, the league contracts are 0-2
+    TOURNAMENT_LEAGUE = 3
+
     league = models.PositiveSmallIntegerField(db_index=True)
     game_id = models.PositiveIntegerField(db_index=True)
     winner = models.CharField(max_length=64, null=True, blank=True)
     started = models.BooleanField(default=False, db_index=True)
     finished = models.BooleanField(default=False, db_index=True)
+    block_number = models.PositiveBigIntegerField(db_index=True, null=True, blank=True)
+    started_block = models.PositiveBigIntegerField(db_index=True, null=True, blank=True)
+    finished_block = models.PositiveBigIntegerField(db_index=True, null=True, blank=True)
+    tournament = models.ForeignKey(Tournament, on_delete=models.SET_NULL, null=True, blank=True, related_name='games')
+    tournament_round = models.PositiveSmallIntegerField(null=True, blank=True)
 
 
 class GamePlayer(models.Model):
     game = models.ForeignKey(GameInfo, on_delete=models.CASCADE)
     address = models.CharField(max_length=64, null=True, blank=True)
+    block_number = models.PositiveBigIntegerField(db_index=True, null=True, blank=True)
+    # players who left are only marked, so that a rolled back PlayerLeft can be restored
+    left_block = models.PositiveBigIntegerField(db_index=True, null=True, blank=True)
+
+
+class GameMove(models.Model):
+    CARD = 0
+    POWER = 1
+
+    game = models.ForeignKey(GameInfo, on_delete=models.CASCADE, related_name='moves')
+    player = models.CharField(max_length=64)
+    kind = models.PositiveSmallIntegerField(choices=((CARD, 'Card'), (POWER, 'Power')))
+    round = models.PositiveSmallIntegerField()
+    token_id = models.PositiveIntegerField(null=True, blank=True)
+    power_type = models.PositiveSmallIntegerField(null=True, blank=True)
+    power_value = models.PositiveIntegerField(null=True, blank=True)
+    block_number = models.PositiveBigIntegerField(db_index=True)
+    log_index = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = 'block_number', 'log_index',
+        # the timeline of a game is read in a single pass over this index
+        index_together = 'game', 'block_number', 'log_index',
+
+
+class ResourceBalance(models.Model):
+    address = models.CharField(max_length=64)
+    token_id = models.PositiveBigIntegerField(db_index=True)
+    balance = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = 'address', 'token_id',
+
+
+class PendingCraft(models.Model):
+    craft_id = models.PositiveBigIntegerField(unique=True)
+    player = models.CharField(max_length=64, db_index=True)
+    token_id = models.PositiveBigIntegerField()
+    block_number = models.PositiveBigIntegerField(db_index=True)
+    claimed_block = models.PositiveBigIntegerField(db_index=True, null=True, blank=True)
+
+
+class ResourceBalanceChange(models.Model):
+    """Balance deltas of the recent blocks, to roll ``ResourceBalance`` back on a reorg."""
+    address = models.CharField(max_length=64)
+    token_id = models.PositiveBigIntegerField()
+    delta = models.BigIntegerField()
+    block_number = models.PositiveBigIntegerField(db_index=True)
+
+
+class IndexedBlock(models.Model):
+    number = models.PositiveBigIntegerField(unique=True)
+    hash = models.CharField(max_length=66)
+
+
+class IndexerCursor(models.Model):
+    contract = models.CharField(max_length=64)
+    stream = models.CharField(max_length=32)
+    block_number = models.PositiveBigIntegerField()
+    block_hash = models.CharField(max_length=66, blank=True)
+    # first block indexed, the stream holds the whole history of its contract if it is not after the start block of its handler
+    start_block = models.PositiveBigIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # last time the indexing process updated the leaderboard weights of the players touched by the stream
+    leaderboard_updated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = 'contract', 'stream',
 
 
@@ -0,0 +1,42 @@
+import hashlib
+import json
+from uuid import uuid4
+
+from django.core.cache import cache
+
+from app.catalog import catalog
+
+# a bumped version makes the cached responses unreachable, the timeout only frees the memory they use
+RESPONSE_TIMEOUT = 600
+
+
+def version_key(model):
+    return f'response_cache:version:{model._meta.label_lower}'
+
+
+def bump_version(model):
+    """Invalidates the cached responses built from ``model``. Call once changes of its rows are committed."""
+    cache.set(version_key(model), uuid4().hex, timeout=None)
+
+
+def get_version(model):
+    version = cache.get(version_key(model))
+    if version is None:
+        cache.add(version_key(model), uuid4().hex, timeout=None)
+        version = cache.get(version_key(model))
+    return version
+
+
+def cached_response(model, name, args, build):
+    """
+    Returns ``build()``, cached by ``name``, the normalized ``args`` it depends on and the versions of
+    ``model`` and of the resource catalog. The version is read before ``build()`` queries the rows, so a
+    response is never cached under a version newer than its data.
+    """
+    digest = hashlib.md5(json.dumps(args, sort_keys=True).encode()).hexdigest()
+    key = f'response_cache:{name}:{get_version(model)}:{catalog.refresh().version}:{digest}'
+    response = cache.get(key)
+    if response is None:
+        response = build()
+        cache.set(key, response, RESPONSE_TIMEOUT)
+    return response
@@ -6,17 +6,21 @@ import graphene
 from constance import config
 from django.conf import settings
 from django.core.cache import cache
-from django.db.models import Q, F
+from django.db.models import Q, F, Prefetch
 from django.utils import timezone
 from eth_account.messages import encode_defunct
 from graphene_django import DjangoListField
 from graphql import GraphQLError
 from web3 import Web3, HTTPProvider
 
-from app.models import MarketplaceListing, Resource, LeaderboardItem, GameChat, GameLeaderboardItem, GameInfo, \
-    GamePlayer, LendingListing
+from app.catalog import catalog
+from app.leaderboard import game_week
+from app.response_cache import cached_response
+from app.models import MarketplaceListing, LeaderboardItem, GameChat, WeeklyGameLeaderboardItem, GameInfo, \
+    GamePlayer, LendingListing, GameMove, Tournament, TournamentPlayer, ResourceBalance
 from app.schema.types import MarketplaceListingResponseType, MarketplaceStatsType, ResourceType, LeaderboardItemType, \
-    GameLeaderboardItemType, SettingsType, GameStatsType, LendingListingResponseType
+    GameLeaderboardItemType, SettingsType, GameStatsType, LendingListingResponseType, GameTimelineType, TournamentType, \
+    ResourceBalanceType
 from talecraft.crypto import web3, games
 
 
@@ -39,14 +43,37 @@ class Query(graphene.ObjectType):
     marketplace_stats = graphene.Field(MarketplaceStatsType)
     resources = DjangoListField(ResourceType)
     resource = graphene.Field(ResourceType, token_id=graphene.ID())
-    leaderboard = DjangoListField(LeaderboardItemType)
-    game_leaderboard = DjangoListField(GameLeaderboardItemType)
+    inventory = graphene.List(ResourceBalanceType, address=graphene.String())
+    leaderboard = DjangoListField(LeaderboardItemType, offset=graphene.Int(default_value=0), limit=graphene.Int())
+    game_leaderboard = DjangoListField(GameLeaderboardItemType, league=graphene.Int(required=False),
+                                       week=graphene.Date(required=False), offset=graphene.Int(default_value=0),
+                                       limit=graphene.Int())
+    game_leaderboard_weeks = graphene.List(graphene.Date, league=graphene.Int(required=False))
+    my_rank = graphene.Field(LeaderboardItemType, address=graphene.String())
+    my_game_rank = graphene.Field(GameLeaderboardItemType, address=graphene.String(), league=graphene.Int(),
+                                  week=graphene.Date(required=False))
     chat_token = graphene.String(chat_id=graphene.String(), sig=graphene.String())
     game_stats = graphene.Field(GameStatsType)
+    game_timeline = graphene.Field(GameTimelineType, league=graphene.Int(), game_id=graphene.Int())
+    tournament = graphene.Field(TournamentType, tournament_id=graphene.Int())
+    tournaments = graphene.List(TournamentType, finished=graphene.Boolean(required=False))
     settings = graphene.Field(SettingsType)
 
     @classmethod
     def resolve_listings(cls, root, info, tiers=None, weights=None, q='', seller='', order='per_item', page=0):
+        args = {
+            'tiers': sorted(set(tiers or [])),
+            'weights': sorted(set(weights or [])),
+            # q and seller are matched case-insensitively
+            'q': (q or '').lower(),
+            'seller': (seller or '').lower(),
+            'order': order or 'per_item',
+            'page': page or 0,
+        }
+        return cached_response(MarketplaceListing, 'listings', args, lambda: cls.listings_page(**args))
+
+    @classmethod
+    def listings_page(cls, tiers, weights, q, seller, order, page):
         weights_q = Q()
         weights_cnt = 0
         tiers_q = Q()
@@ -78,12 +105,28 @@ class Query(graphene.ObjectType):
         qs = qs.order_by(order)
 
         return {
-            'items': qs[page*16:(page+1)*16],
+            'items': list(qs[page*16:(page+1)*16]),
             'total_items': qs.count(),
         }
 
     @classmethod
     def resolve_borrow_listings(cls, root, info, tiers=None, weights=None, q='', seller='', special=None, order='price', page=0):
+        args = {
+            'tiers': sorted(set(tiers or [])),
+            'weights': sorted(set(weights or [])),
+            'q': (q or '').lower(),
+            'seller': seller or '',
+            'special': special,
+            'order': order or 'price',
+            'page': page or 0,
+        }
+        if special in ('retrievable', 'borrowed'):
+            # these depend on the current time, not only on the listings
+            return cls.borrow_listings_page(**args)
+        return cached_response(LendingListing, 'borrow_listings', args, lambda: cls.borrow_listings_page(**args))
+
+    @classmethod
+    def borrow_listings_page(cls, tiers, weights, q, seller, special, order, page):
         weights_q = Q()
         weights_cnt = 0
         tiers_q = Q()
@@ -124,7 +167,7 @@ class Query(graphene.ObjectType):
         qs = qs.order_by(order)
 
         return {
-            'items': qs[page*16:(page+1)*16],
+            'items': list(qs[page*16:(page+1)*16]),
             'total_items': qs.count(),
         }
 
@@ -138,19 +181,45 @@ class Query(graphene.ObjectType):
 
     @classmethod
     def resolve_resources(cls, root, info):
-        return Resource.objects.order_by('token_id')
+        return catalog.all()
 
     @classmethod
     def resolve_resource(cls, root, info, token_id):
-        return Resource.objects.filter(token_id=token_id).first()
+        return catalog.get(int(token_id))
+
+    @classmethod
+    def resolve_inventory(cls, root, info, address):
+        return ResourceBalance.objects.filter(address=Web3.toChecksumAddress(address), balance__gt=0).order_by('token_id')
+
+    @classmethod
+    def resolve_leaderboard(cls, root, info, offset=0, limit=None):
+        # players added since the last update_leaderboard run are not ranked yet
+        qs = LeaderboardItem.objects.order_by(F('rank').asc(nulls_last=True), 'address')
+        return qs[offset:None if limit is None else offset + limit]
+
+    @classmethod
+    def resolve_game_leaderboard(cls, root, info, league=None, week=None, offset=0, limit=None):
+        qs = WeeklyGameLeaderboardItem.objects.filter(week=week or game_week(timezone.now()))
+        if league is not None:
+            qs = qs.filter(league=league)
+        qs = qs.order_by('league', F('rank').asc(nulls_last=True), 'address')
+        return qs[offset:None if limit is None else offset + limit]
 
     @classmethod
-    def resolve_leaderboard(cls, root, info):
-        return LeaderboardItem.objects.order_by('-weight')
+    def resolve_game_leaderboard_weeks(cls, root, info, league=None):
+        qs = WeeklyGameLeaderboardItem.objects.all()
+        if league is not None:
+            qs = qs.filter(league=league)
+        return qs.values_list('week', flat=True).distinct().order_by('-week')
 
     @classmethod
-    def resolve_game_leaderboard(cls, root, info):
-        return GameLeaderboardItem.objects.exclude(_wins=F('_wins_offset'), _played=F('_played_offset'))
+    def resolve_my_rank(cls, root, info, address):
+        return LeaderboardItem.objects.filter(address=Web3.toChecksumAddress(address)).first()
+
+    @classmethod
+    def resolve_my_game_rank(cls, root, info, address, league, week=None):
+        return WeeklyGameLeaderboardItem.objects.filter(week=week or game_week(timezone.now()), league=league,
+                                                        address=Web3.toChecksumAddress(address)).first()
 
     @classmethod
     def resolve_chat_token(cls, root, info, chat_id, sig):
@@ -181,15 +250,44 @@ class Query(graphene.ObjectType):
     def resolve_game_stats(cls, root, info):
         return {
             'junior': {
-                'waiting': GamePlayer.objects.filter(game__league=0, game__started=False).count(),
-                'in_game': GamePlayer.objects.filter(game__league=0, game__started=True, game__finished=False).count(),
+                'waiting': GamePlayer.objects.filter(left_block__isnull=True, game__league=0, game__started=False).count(),
+                'in_game': GamePlayer.objects.filter(left_block__isnull=True, game__league=0, game__started=True, game__finished=False).count(),
             },
             'senior': {
-                'waiting': GamePlayer.objects.filter(game__league=1, game__started=False).count(),
-                'in_game': GamePlayer.objects.filter(game__league=1, game__started=True, game__finished=False).count(),
+                'waiting': GamePlayer.objects.filter(left_block__isnull=True, game__league=1, game__started=False).count(),
+                'in_game': GamePlayer.objects.filter(left_block__isnull=True, game__league=1, game__started=True, game__finished=False).count(),
             },
             'master': {
-                'waiting': GamePlayer.objects.filter(game__league=2, game__started=False).count(),
-                'in_game': GamePlayer.objects.filter(game__league=2, game__started=True, game__finished=False).count(),
+                'waiting': GamePlayer.objects.filter(left_block__isnull=True, game__league=2, game__started=False).count(),
+                'in_game': GamePlayer.objects.filter(left_block__isnull=True, game__league=2, game__started=True, game__finished=False).count(),
             },
         }
+
+    @classmethod
+    def resolve_game_timeline(cls, root, info, league, game_id):
+        return GameInfo.objects.filter(league=league, game_id=game_id).prefetch_related(*game_timeline_prefetches()).first()
+
+    @classmethod
+    def resolve_tournament(cls, root, info, tournament_id):
+        return tournaments_queryset().filter(tournament_id=tournament_id).first()
+
+    @classmethod
+    def resolve_tournaments(cls, root, info, finished=None):
+        qs = tournaments_queryset().order_by('-tournament_id')
+        if finished is not None:
+            qs = qs.filter(finished=finished)
+        return qs
+
+
+def game_timeline_prefetches():
+    return (
+        Prefetch('gameplayer_set', queryset=GamePlayer.objects.filter(left_block__isnull=True).order_by('pk')),
+        Prefetch('moves', queryset=GameMove.objects.order_by('block_number', 'log_index')),
+    )
+
+
+def tournaments_queryset():
+    return Tournament.objects.prefetch_related(
+        Prefetch('players', queryset=TournamentPlayer.objects.order_by('block_number', 'log_index')),
+        Prefetch('games', queryset=GameInfo.objects.order_by('tournament_round', 'game_id').prefetch_related(*game_timeline_prefetches())),
+    )
@@ -3,8 +3,9 @@ from decimal import Decimal
 import graphene
 from graphene_django import DjangoObjectType, DjangoListField
 
-from app.models import Resource, MarketplaceListing, LeaderboardItem, GameChatMessage, GameLeaderboardItem, \
-    LendingListing
+from app.catalog import catalog
+from app.models import Resource, MarketplaceListing, LeaderboardItem, GameChatMessage, WeeklyGameLeaderboardItem, \
+    LendingListing, GameInfo, GameMove, Tournament, ResourceBalance
 
 
 def paginated_type(name, cls):
@@ -57,6 +58,10 @@ class MarketplaceListingType(DjangoObjectType):
     resource = graphene.Field(ResourceType)
     per_item = graphene.Decimal()
 
+    @staticmethod
+    def resolve_resource(listing: MarketplaceListing, info):
+        return catalog.get_by_pk(listing.resource_id)
+
     @staticmethod
     def resolve_per_item(listing: MarketplaceListing, info):
         return Decimal(listing.price / listing.amount)
@@ -73,6 +78,10 @@ class LendingListingType(DjangoObjectType):
     resource = graphene.Field(ResourceType)
     duration = graphene.Int()
 
+    @staticmethod
+    def resolve_resource(listing: LendingListing, info):
+        return catalog.get_by_pk(listing.resource_id)
+
     @staticmethod
     def resolve_duration(listing: LendingListing, info):
         return int(listing.duration.total_seconds())
@@ -85,6 +94,12 @@ class LendingListingType(DjangoObjectType):
 LendingListingResponseType = paginated_type('LendingListingResponseType', LendingListingType)
 
 
+class ResourceBalanceType(DjangoObjectType):
+    class Meta:
+        model = ResourceBalance
+        fields = 'token_id', 'balance',
+
+
 class MarketplaceStatsType(graphene.ObjectType):
     min_element_price = graphene.Decimal()
 
@@ -92,16 +107,13 @@ class MarketplaceStatsType(graphene.ObjectType):
 class LeaderboardItemType(DjangoObjectType):
     class Meta:
         model = LeaderboardItem
-        fields = 'address', 'weight', 'max_tier', 'tier0', 'tier1', 'tier2', 'tier3', 'tier4', 'tier5',
+        fields = 'address', 'weight', 'max_tier', 'tier0', 'tier1', 'tier2', 'tier3', 'tier4', 'tier5', 'rank',
 
 
 class GameLeaderboardItemType(DjangoObjectType):
-    played = graphene.Int()
-    wins = graphene.Int()
-
     class Meta:
-        model = GameLeaderboardItem
-        fields = 'address', 'played', 'wins', 'league',
+        model = WeeklyGameLeaderboardItem
+        fields = 'address', 'played', 'wins', 'league', 'rank', 'week',
 
 
 class GameChatMessageType(DjangoObjectType):
@@ -121,5 +133,88 @@ class GameStatsType(graphene.ObjectType):
     master = graphene.Field(GameStatsItemType)
 
 
+class GameMoveType(DjangoObjectType):
+    kind = graphene.String()
+
+    @staticmethod
+    def resolve_kind(move: GameMove, info):
+        return move.get_kind_display().lower()
+
+    class Meta:
+        model = GameMove
+        fields = 'player', 'kind', 'round', 'token_id', 'power_type', 'power_value', 'block_number', 'log_index',
+
+
+class GameTimelineType(DjangoObjectType):
+    players = graphene.List(graphene.String)
+    moves = graphene.List(GameMoveType)
+
+    @staticmethod
+    def resolve_players(game: GameInfo, info):
+        return [player.address for player in game.gameplayer_set.all()]
+
+    @staticmethod
+    def resolve_moves(game: GameInfo, info):
+        return game.moves.all()
+
+    class Meta:
+        model = GameInfo
+        fields = 'league', 'game_id', 'winner', 'started', 'finished', 'players', 'moves',
+
+
+class TournamentRoundType(graphene.ObjectType):
+    round = graphene.Int()
+    games = graphene.List(GameTimelineType)
+
+
+class TournamentStandingType(graphene.ObjectType):
+    address = graphene.String()
+    wins = graphene.Int()
+    eliminated_round = graphene.Int()
+    place = graphene.Int()
+
+
+class TournamentType(DjangoObjectType):
+    participants = graphene.List(graphene.String)
+    bracket = graphene.List(TournamentRoundType)
+    standings = graphene.List(TournamentStandingType)
+
+    @staticmethod
+    def resolve_participants(tournament: Tournament, info):
+        return [player.address for player in tournament.players.all()]
+
+    @staticmethod
+    def resolve_bracket(tournament: Tournament, info):
+        rounds = [{'round': r, 'games': []} for r in range(tournament.players_count.bit_length() - 1)]
+        for game in tournament.games.all():
+            rounds[game.tournament_round]['games'].append(game)
+        return rounds
+
+    @staticmethod
+    def resolve_standings(tournament: Tournament, info):
+        rounds_count = tournament.players_count.bit_length() - 1
+        standings = {player.address: {'address': player.address, 'wins': 0, 'eliminated_round': None, 'place': None}
+                     for player in tournament.players.all()}
+        for game in tournament.games.all():
+            if not game.finished or not game.winner:
+                continue
+            for player in game.gameplayer_set.all():
+                standing = standings.setdefault(player.address, {'address': player.address, 'wins': 0, 'eliminated_round': None, 'place': None})
+                if player.address == game.winner:
+                    standing['wins'] += 1
+                else:
+                    standing['eliminated_round'] = game.tournament_round
+                    # losers of the final are second, of the semi-finals third, and so on
+                    standing['place'] = 2 ** (rounds_count - game.tournament_round - 1) + 1
+        if tournament.finished and tournament.winner in standings:
+            standings[tournament.winner]['place'] = 1
+        return sorted(standings.values(), key=lambda s: (s['place'] is None, s['place'] or 0, -s['wins']))
+
+    class Meta:
+        model = Tournament
+        fields = 'tournament_id', 'players_count', 'start_time', 'join_deadline', 'winner', 'started', 'finished', \
+                 'participants', 'bracket', 'standings',
+
+
 class SettingsType(graphene.ObjectType):
     chest_sale_active = graphene.Boolean()
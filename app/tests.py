@@ -1,3 +1,351 @@
-from django.test import TestCase
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, SimpleTestCase
+
+import websockets
+from eth_utils import to_hex
+
+from app.catalog import catalog
+from app.indexer import Indexer, Event, MarketplaceHandler, GamesHandler, ResourceHandler, HeadSubscription
+from app.models import LeaderboardItem, GameLeaderboardItem, WeeklyGameLeaderboardItem, Resource, GameInfo, GamePlayer, \
+    GameMove, MarketplaceListing, ResourceBalance, IndexedBlock, IndexerCursor
+from app.upsert import bulk_upsert, delete_missing
+from talecraft.crypto import marketplace, games, resource
+from talecraft.rpc import PooledHTTPProvider
+
+FIELDS = 'weight', 'max_tier', 'tier5',
+
+
+def item(address, weight, max_tier=0, tier5=0):
+    return {'address': address, 'weight': weight, 'max_tier': max_tier, 'tier5': tier5}
+
+
+class BulkUpsertTest(TestCase):
+    def rows(self):
+        return {row['address']: row for row in LeaderboardItem.objects.values('address', *FIELDS, 'tier0', 'rank')}
+
+    def test_insert(self):
+        written = bulk_upsert(LeaderboardItem, [item('0x1', 10, 1), item('0x2', 20, 5, tier5=20)], ['address'], FIELDS)
+        self.assertEqual(written, 2)
+        self.assertEqual(self.rows(), {
+            '0x1': {'address': '0x1', 'weight': 10, 'max_tier': 1, 'tier5': 0, 'tier0': 0, 'rank': None},
+            '0x2': {'address': '0x2', 'weight': 20, 'max_tier': 5, 'tier5': 20, 'tier0': 0, 'rank': None},
+        })
+
+    def test_update(self):
+        LeaderboardItem.objects.create(address='0x1', weight=10, max_tier=1, tier0=3, rank=1)
+        LeaderboardItem.objects.create(address='0x2', weight=20, max_tier=2, rank=2)
+        written = bulk_upsert(LeaderboardItem, [item('0x1', 30, 5, tier5=30), item('0x3', 5)], ['address'], FIELDS)
+        self.assertEqual(written, 2)
+        rows = self.rows()
+        # the fields which are not updated keep their values
+        self.assertEqual(rows['0x1'], {'address': '0x1', 'weight': 30, 'max_tier': 5, 'tier5': 30, 'tier0': 3, 'rank': 1})
+        self.assertEqual(rows['0x2']['weight'], 20)
+        self.assertEqual(rows['0x3']['weight'], 5)
+
+    def test_unchanged_rows_are_not_written(self):
+        bulk_upsert(LeaderboardItem, [item('0x1', 10, 1), item('0x2', 20, 2)], ['address'], FIELDS)
+        self.assertEqual(bulk_upsert(LeaderboardItem, [item('0x1', 10, 1), item('0x2', 20, 2)], ['address'], FIELDS), 0)
+        self.assertEqual(bulk_upsert(LeaderboardItem, [item('0x1', 10, 1), item('0x2', 20, 3)], ['address'], FIELDS), 1)
+        self.assertEqual(self.rows()['0x2']['max_tier'], 3)
+
+    def test_unique_together(self):
+        GameLeaderboardItem.objects.create(league=0, address='0x1', _played=1, _wins=0)
+        rows = [{'league': league, 'address': '0x1', '_played': 2, '_wins': 1} for league in (0, 1)]
+        self.assertEqual(bulk_upsert(GameLeaderboardItem, rows, ['league', 'address'], ['_played', '_wins'], batch_size=1), 2)
+        self.assertEqual(sorted(GameLeaderboardItem.objects.values_list('league', 'address', '_played', '_wins')),
+                         [(0, '0x1', 2, 1), (1, '0x1', 2, 1)])
+        self.assertEqual(bulk_upsert(GameLeaderboardItem, rows, ['league', 'address'], ['_played', '_wins'], batch_size=1), 0)
+
+    def test_null_values(self):
+        week = date(2022, 1, 7)
+        fields = ['week', 'league', 'address']
+
+        def upsert(rank):
+            row = {'week': week, 'league': 0, 'address': '0x1', 'played': 1, 'wins': 1, 'rank': rank}
+            return bulk_upsert(WeeklyGameLeaderboardItem, [row], fields, ['played', 'wins', 'rank'])
+
+        self.assertEqual(upsert(None), 1)
+        self.assertEqual(upsert(None), 0)
+        self.assertEqual(upsert(1), 1)
+        self.assertEqual(upsert(1), 0)
+        self.assertEqual(upsert(None), 1)
+        self.assertIsNone(WeeklyGameLeaderboardItem.objects.get().rank)
+
+    def test_batches(self):
+        rows = [item(f'0x{i}', i) for i in range(25)]
+        self.assertEqual(bulk_upsert(LeaderboardItem, rows, ['address'], FIELDS, batch_size=10), 25)
+        self.assertEqual(LeaderboardItem.objects.count(), 25)
+
+    def test_delete_missing(self):
+        bulk_upsert(LeaderboardItem, [item(f'0x{i}', i) for i in range(5)], ['address'], FIELDS)
+        delete_missing(LeaderboardItem.objects.filter(weight__gte=2), 'address', ['0x2', '0x4'], batch_size=1)
+        self.assertEqual(sorted(LeaderboardItem.objects.values_list('address', flat=True)), ['0x0', '0x1', '0x2', '0x4'])
+
+
+class StubMarketplaceHandler(MarketplaceHandler):
+    def fetch_listings(self, listing_ids):
+        # (token id, amount, price, seller) of each listing
+        return [(1, 2, 10**18, f'0xseller{listing_id}') for listing_id in listing_ids]
+
+
+def block_hash(number, fork=False):
+    return (b'\xff' if fork else b'\x00') + number.to_bytes(31, 'big')
+
+
+class ReorgTest(TestCase):
+    def setUp(self):
+        Resource.objects.create(token_id=1, name='Water', tier=0, ipfs_hash='', weight=1)
+        catalog.load()
+        self.indexer = Indexer([StubMarketplaceHandler(marketplace), GamesHandler(list(games.values())[0], league=0),
+                                ResourceHandler(resource)])
+        self.indexer.init_cursors(99)
+        events_logger = logging.getLogger('app.indexer.events')
+        events_logger.disabled = True
+        self.addCleanup(setattr, events_logger, 'disabled', False)
+
+    def event(self, handler, name, block, index=0, **args):
+        return Event(name, handler.contract.address, namedtuple(name, args)(**args), block, index, b'', block_hash(block))
+
+    def index(self, events, to_block):
+        self.indexer.prepare(events)
+        self.indexer.apply(events)
+        self.indexer.checkpoint(to_block, to_hex(block_hash(to_block)))
+
+    def state(self):
+        return {
+            'games': sorted(GameInfo.objects.values_list('game_id', 'started', 'started_block')),
+            'players': sorted(GamePlayer.objects.values_list('game__game_id', 'address')),
+            'moves': sorted(GameMove.objects.values_list('game__game_id', 'player', 'round')),
+            'listings': sorted(MarketplaceListing.objects.values_list('listing_id', 'closed', 'buyer', 'closed_block')),
+            # a rolled back transfer may leave an empty balance, as a transfer of the whole balance does
+            'balances': sorted(ResourceBalance.objects.exclude(balance=0).values_list('address', 'token_id', 'balance')),
+        }
+
+    def test_rollback(self):
+        market, game, res = self.indexer.handlers.values()
+        self.index([
+            self.event(game, 'PlayerEntered', 100, gameId=1, player='0xa'),
+            self.event(market, 'NewListing', 101, seller='0xseller1', listingId=1),
+            self.event(res, 'TransferSingle', 102, operator='0xa', from_='0x0000000000000000000000000000000000000000',
+                       to='0xa', id=1, value=5),
+        ], 105)
+        before_fork = self.state()
+        self.index([
+            self.event(game, 'PlayerEntered', 106, gameId=1, player='0xb'),
+            self.event(game, 'GameStarted', 106, 1, gameId=1),
+            self.event(game, 'PlayerPlacedCard', 107, gameId=1, player='0xa', tokenId=1),
+            self.event(game, 'PlayerEntered', 107, 1, gameId=2, player='0xc'),
+            self.event(market, 'Trade', 108, seller='0xseller1', buyer='0xb', listingId=1),
+            self.event(market, 'NewListing', 108, 1, seller='0xseller2', listingId=2),
+            self.event(res, 'TransferSingle', 109, operator='0xa', from_='0xa', to='0xb', id=1, value=2),
+        ], 110)
+        self.assertNotEqual(self.state(), before_fork)
+        self.assertEqual(self.state()['balances'], [('0xa', 1, 3), ('0xb', 1, 2)])
+
+        # blocks 106 and later were replaced
+        chain = SimpleNamespace(get_block=lambda n: SimpleNamespace(hash=block_hash(n, fork=n > 105), timestamp=0,
+                                                                    parentHash=block_hash(n - 1, fork=n - 1 > 105)))
+        with mock.patch('app.indexer.indexer.web3', SimpleNamespace(eth=chain)):
+            fork_block = self.indexer.find_fork()
+        self.assertEqual(fork_block, 105)
+        self.indexer.rollback(fork_block)
+
+        self.assertEqual(self.state(), before_fork)
+        self.assertEqual(set(IndexerCursor.objects.values_list('block_number', 'block_hash')), {(105, to_hex(block_hash(105)))})
+        self.assertEqual(list(IndexedBlock.objects.values_list('number', flat=True)), [105])
+        # the next window continues from the fork
+        self.assertEqual(self.indexer.last_block, 105)
+
+
+class StubNode(ThreadingHTTPServer):
+    """Local stand-in for an RPC node, answering every call with its name, or failing, after ``delay`` seconds."""
+
+    daemon_threads = True
+    block_on_close = False
+
+    def __init__(self, name, delay=0, fail=False, head=100):
+        super().__init__(('127.0.0.1', 0), StubNodeHandler)
+        self.name, self.delay, self.fail, self.head = name, delay, fail, head
+        self.calls = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def uri(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class StubNodeHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        node = self.server
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        node.calls.append(request['method'])
+        time.sleep(node.delay)
+        if node.fail:
+            self.send_error(502)
+            return
+        result = hex(node.head) if request['method'] == 'eth_blockNumber' else node.name
+        body = json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': result}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class PooledHTTPProviderTest(SimpleTestCase):
+    def setUp(self):
+        self.nodes = []
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.shutdown()
+            node.server_close()
+
+    def provider(self, *nodes, **kwargs):
+        self.nodes.extend(nodes)
+        return PooledHTTPProvider([node.uri for node in nodes], pool_size=2, retries=0, timeout=5, **kwargs)
+
+    def call(self, provider, method='eth_chainId', params=()):
+        return provider.make_request(method, list(params))['result']
+
+    def test_routes_to_fastest_node(self):
+        slow, fast = StubNode('slow', delay=0.2), StubNode('fast')
+        provider = self.provider(slow, fast)
+        # every node is measured first
+        self.assertEqual([self.call(provider), self.call(provider)], ['slow', 'fast'])
+        self.assertEqual([self.call(provider) for _ in range(3)], ['fast'] * 3)
+        self.assertEqual(len(slow.calls), 1)
+
+    def test_failover(self):
+        failing, fast = StubNode('failing', fail=True), StubNode('fast')
+        provider = self.provider(failing, fast)
+        self.assertEqual(self.call(provider), 'fast')
+        self.assertEqual(failing.calls, ['eth_chainId'])
+        self.assertGreater(provider.endpoints[0].error_rate, 0)
+
+    def test_circuit_breaker(self):
+        failing, fast = StubNode('failing', fail=True), StubNode('fast')
+        provider = self.provider(failing, fast, failure_threshold=2, cooldown=60)
+        for endpoint in provider.endpoints:
+            # keeps the failing node first until its circuit opens
+            endpoint.latency = 0.001 if endpoint.uri == failing.uri else 1
+        self.assertEqual([self.call(provider) for _ in range(5)], ['fast'] * 5)
+        self.assertEqual(len(failing.calls), 2)
+        # back in the pool once the cooldown has elapsed
+        provider.endpoints[0].open_until = 0
+        self.assertIn(provider.endpoints[0], provider.ranked_endpoints())
+
+    def test_hedging(self):
+        stuck, fast = StubNode('stuck', delay=2), StubNode('fast')
+        provider = self.provider(stuck, fast, hedge_after=0.1)
+        started = time.monotonic()
+        self.assertEqual(self.call(provider), 'fast')
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(len(stuck.calls), 1)
+
+    def test_get_logs_is_not_hedged(self):
+        slow, fast = StubNode('slow', delay=0.5), StubNode('fast')
+        provider = self.provider(slow, fast, hedge_after=0.1)
+        self.assertEqual(self.call(provider, 'eth_getLogs', [{'fromBlock': '0x1', 'toBlock': '0x64'}]), 'slow')
+        self.assertEqual(fast.calls, ['eth_blockNumber'])
+
+    def test_get_logs_only_from_synced_nodes(self):
+        lagging, synced = StubNode('lagging', head=90), StubNode('synced', delay=0.1, head=100)
+        provider = self.provider(lagging, synced)
+        logs = {'fromBlock': '0x50', 'toBlock': hex(100)}
+        self.assertEqual([self.call(provider, 'eth_getLogs', [logs]) for _ in range(3)], ['synced'] * 3)
+        self.assertNotIn('eth_getLogs', lagging.calls)
+        # a node which has reached the block is asked for its head only once
+        self.assertEqual(synced.calls.count('eth_blockNumber'), 1)
+        # blocks which are not past the head of the lagging node are read from any node
+        self.assertEqual(self.call(provider, 'eth_getLogs', [dict(logs, toBlock=hex(90))]), 'lagging')
+        with self.assertRaises(Exception):
+            self.call(provider, 'eth_getLogs', [dict(logs, toBlock=hex(101))])
+
+
+class StubHeadsNode(threading.Thread):
+    """
+    Local stand-in for a WebSocket RPC node: the first connection gets one ``newHeads`` notification and is dropped,
+    the next ones are served once ``reconnect`` is set and stay open.
+    """
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.loop = asyncio.new_event_loop()
+        self.connections = 0
+        self.reconnect = threading.Event()
+        self.ready = threading.Event()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(websockets.serve(self.handler, '127.0.0.1', 0))
+        self.uri = 'ws://127.0.0.1:{}'.format(self.server.sockets[0].getsockname()[1])
+        self.ready.set()
+        self.loop.run_forever()
+
+    def stop(self):
+        self.reconnect.set()
+        asyncio.run_coroutine_threadsafe(self.close(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handler(self, ws, *args):
+        self.connections += 1
+        first = self.connections == 1
+        while not first and not self.reconnect.is_set():
+            await asyncio.sleep(0.05)
+        request = json.loads(await ws.recv())
+        await ws.send(json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': '0xabc'}))
+        await ws.send(json.dumps({'jsonrpc': '2.0', 'method': 'eth_subscription',
+                                  'params': {'subscription': '0xabc', 'result': {'number': hex(16 if first else 17)}}}))
+        if not first:
+            await ws.wait_closed()
+
+
+class HeadSubscriptionTest(SimpleTestCase):
+    def test_wake_up_and_fall_back_to_polling(self):
+        node = StubHeadsNode()
+        node.start()
+        node.ready.wait(5)
+        self.addCleanup(node.stop)
+        heads = HeadSubscription(node.uri, reconnect_delay=0.2)
+        heads.start()
+        # the thread outlives the test, keep it from reconnecting in a loop
+        self.addCleanup(setattr, heads, 'reconnect_delay', 3600)
+
+        started = time.monotonic()
+        heads.wait(5)
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(heads.head, 16)
+
+        # the node dropped the connection, waiting degrades to polling
+        deadline = time.monotonic() + 5
+        while heads.connected and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIsNone(heads.get_head())
+        started = time.monotonic()
+        heads.wait(0.3)
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+
+        node.reconnect.set()
+        started = time.monotonic()
+        heads.wait(5)
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(heads.get_head(), 17)
+        self.assertEqual(node.connections, 2)
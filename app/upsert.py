@@ -0,0 +1,44 @@
+from django.db import connection
+
+
+def bulk_upsert(model, rows, unique_fields, update_fields, batch_size=1000):
+    """
+    Writes ``rows`` (dicts of field values) to the table of ``model`` with one ``INSERT ... ON CONFLICT`` statement
+    per batch: rows whose ``unique_fields`` already exist get their ``update_fields`` updated, the others are inserted
+    with the field defaults for the missing values. Existing rows which would not change are not rewritten.
+    Returns how many rows were inserted or updated.
+
+    PostgreSQL and SQLite only, ``unique_fields`` must be covered by a unique constraint.
+    """
+    meta = model._meta
+    qn = connection.ops.quote_name
+    insert_fields = [field for field in meta.concrete_fields if not field.primary_key]
+    update_columns = [qn(meta.get_field(name).column) for name in update_fields]
+    distinct = 'IS DISTINCT FROM' if connection.vendor == 'postgresql' else 'IS NOT'
+    sql = (
+        f'INSERT INTO {qn(meta.db_table)} ({", ".join(qn(field.column) for field in insert_fields)}) VALUES {{values}} '
+        f'ON CONFLICT ({", ".join(qn(meta.get_field(name).column) for name in unique_fields)}) '
+        f'DO UPDATE SET {", ".join(f"{column} = EXCLUDED.{column}" for column in update_columns)} '
+        f'WHERE {" OR ".join(f"{qn(meta.db_table)}.{column} {distinct} EXCLUDED.{column}" for column in update_columns)}'
+    )
+    placeholders = f'({", ".join(["%s"] * len(insert_fields))})'
+    batch_size = min(batch_size, connection.ops.bulk_batch_size(insert_fields, rows) or batch_size)
+    written = 0
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), batch_size):
+            batch = rows[offset:offset + batch_size]
+            params = [
+                field.get_db_prep_save(row[field.name] if field.name in row else field.get_default(), connection)
+                for row in batch for field in insert_fields
+            ]
+            cursor.execute(sql.format(values=', '.join([placeholders] * len(batch))), params)
+            written += cursor.rowcount
+    return written
+
+
+def delete_missing(queryset, field, kept, batch_size=1000):
+    """Deletes the rows of ``queryset`` whose ``field`` is not in ``kept``."""
+    kept = set(kept)
+    stale = [pk for pk, value in queryset.values_list('pk', field).iterator() if value not in kept]
+    for offset in range(0, len(stale), batch_size):
+        queryset.model.objects.filter(pk__in=stale[offset:offset + batch_size]).delete()
@@ -1,3 +1,9 @@
-from django.shortcuts import render
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 
-# Create your views here.
+from app.indexer.metrics import get_published_metrics
+
+
+@staff_member_required
+def indexer_metrics(request):
+    return JsonResponse(get_published_metrics())
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+import tempfile
+import zlib
+from pathlib import Path
+
+MODES = 'record', 'replay', 'once',
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+def _json_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return '0x' + bytes(value).hex()
+    raise TypeError(f'Cannot serialize {type(value).__name__} in RPC params')
+
+
+class Cassette:
+    """
+    On-disk store of JSON-RPC responses addressed by the hash of the method and params.
+    Each response is a zlib-compressed JSON file at ``<path>/<hash[:2]>/<hash[2:]>``.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def key(self, method, params):
+        payload = json.dumps([method, params], sort_keys=True, separators=(',', ':'), default=_json_default)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def file(self, key):
+        return self.path / key[:2] / key[2:]
+
+    def get(self, method, params):
+        try:
+            with open(self.file(self.key(method, params)), 'rb') as f:
+                return json.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+
+    def put(self, method, params, response):
+        file = self.file(self.key(method, params))
+        file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=file.parent)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(zlib.compress(json.dumps(response, separators=(',', ':')).encode()))
+        os.replace(tmp, file)
+
+
+def construct_cassette_middleware(path, mode='replay'):
+    """
+    Web3 middleware recording responses to a ``Cassette`` or serving them from it. Inject it at ``layer=0``,
+    next to the provider, so it sees raw JSON-RPC params and responses.
+
+    * ``record`` - always forwards the request and stores the response
+    * ``replay`` - only serves stored responses, raises ``CassetteMiss`` for unknown requests
+    * ``once`` - serves stored responses and records the missing ones
+    """
+    if mode not in MODES:
+        raise ValueError(f'Unknown cassette mode {mode!r}, expected one of {", ".join(MODES)}')
+    cassette = Cassette(path)
+
+    def cassette_middleware(make_request, w3):
+        def middleware(method, params):
+            if mode != 'record':
+                response = cassette.get(method, params)
+                if response is not None:
+                    return response
+                if mode == 'replay':
+                    raise CassetteMiss(f'No recorded response for {method}{params!r} in {cassette.path}')
+            response = make_request(method, params)
+            cassette.put(method, params, response)
+            return response
+        return middleware
+
+    return cassette_middleware
@@ -1,7 +1,13 @@
 import json
+import logging
+from functools import lru_cache
 
 from django.conf import settings
-from web3 import Web3, HTTPProvider
+from web3 import Web3
+
+from talecraft.cassette import construct_cassette_middleware
+from talecraft.metrics import rpc_metrics_middleware
+from talecraft.rpc import PooledHTTPProvider
 
 with open(settings.BASE_DIR / 'frontend/src/utils/contracts' / ('testnetAddresses.ts' if settings.TESTNET else 'addresses.ts')) as f:
     addresses = json.loads(f.read()[14:])
@@ -15,6 +21,9 @@ with open(settings.BASE_DIR / 'frontend/src/utils/contracts/resource.abi.json')
 with open(settings.BASE_DIR / 'frontend/src/utils/contracts/game2.abi.json') as f:
     game_abi = json.load(f)
 
+with open(settings.BASE_DIR / 'frontend/src/utils/contracts/gameTournament.abi.json') as f:
+    tournament_abi = json.load(f)
+
 with open(settings.BASE_DIR / 'frontend/src/utils/contracts/gameLending.abi.json') as f:
     lending_abi = json.load(f)
 
@@ -22,7 +31,14 @@ with open(settings.BASE_DIR / 'frontend/src/utils/contracts/chest.abi.json') as
     chest_abi = json.load(f)
 
 ETH_RPC = 'https://api.avax-test.network/ext/bc/C/rpc' if settings.TESTNET else 'https://api.avax.network/ext/bc/C/rpc'
-web3 = Web3(HTTPProvider(ETH_RPC))
+ETH_WS_RPC = 'wss://api.avax-test.network/ext/bc/C/ws' if settings.TESTNET else 'wss://api.avax.network/ext/bc/C/ws'
+web3 = Web3(PooledHTTPProvider(settings.ETH_RPC_ENDPOINTS or [ETH_RPC], pool_size=settings.ETH_RPC_POOL_SIZE))
+web3.middleware_onion.inject(rpc_metrics_middleware, 'metrics', layer=0)
+if settings.ETH_RPC_CASSETTE:
+    web3.middleware_onion.inject(construct_cassette_middleware(settings.ETH_RPC_CASSETTE, settings.ETH_RPC_CASSETTE_MODE), 'cassette', layer=0)
+
+# first block of the game contracts, nothing of interest is emitted before it
+START_BLOCK = 8521077
 
 resource = web3.eth.contract(address=addresses['resource'], abi=resource_abi)
 marketplace = web3.eth.contract(address=addresses['marketplace'], abi=marketplace_abi)
@@ -31,5 +47,33 @@ games = {
     'senior': web3.eth.contract(address=addresses['games']['1'], abi=game_abi),
     'master': web3.eth.contract(address=addresses['games']['2'], abi=game_abi),
 }
+tournament = web3.eth.contract(address=addresses['gameTournament'], abi=tournament_abi)
 lending = web3.eth.contract(address=addresses['lending'], abi=lending_abi)
 chest = web3.eth.contract(address=addresses['chest'], abi=chest_abi)
+
+
+def find_deploy_block(address, high=None):
+    """Bisects the first block at which ``address`` has code. Needs a node serving historical state."""
+    low, high = 0, web3.eth.block_number if high is None else high
+    if not web3.eth.get_code(address, high):
+        raise Exception(f'{address} has no code at block {high}')
+    while low < high:
+        middle = (low + high) // 2
+        if web3.eth.get_code(address, middle):
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+@lru_cache()
+def resource_start_block():
+    """Deploy block of the resource contract, which minted before the game contracts; its index starts there."""
+    if settings.INDEXER_RESOURCE_START_BLOCK:
+        return settings.INDEXER_RESOURCE_START_BLOCK
+    try:
+        return find_deploy_block(resource.address)
+    except Exception as e:
+        logging.warning(f'Cannot find the deploy block of the resource contract ({e}), indexing it from block 1. '
+                        f'Set INDEXER_RESOURCE_START_BLOCK to skip the blocks before it')
+        return 1
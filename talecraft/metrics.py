@@ -0,0 +1,77 @@
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram:
+    __slots__ = 'counts', 'sum', 'count',
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        buckets, total = {}, 0
+        for le, count in zip(BUCKETS + ('+Inf',), self.counts):
+            total += count
+            buckets[str(le)] = total
+        return {'buckets': buckets, 'sum': self.sum, 'count': self.count}
+
+
+class Metrics:
+    """Process-wide counters, gauges and histograms. Names follow the Prometheus ``name{label="value"}`` form."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(int)
+        self.gauges = {}
+        self.histograms = defaultdict(Histogram)
+
+    def incr(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def set(self, name, value):
+        self.gauges[name] = value
+
+    def observe(self, name, value):
+        with self.lock:
+            self.histograms[name].observe(value)
+
+    @contextmanager
+    def timer(self, name):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'histograms': {name: h.snapshot() for name, h in self.histograms.items()},
+            }
+
+
+metrics = Metrics()
+
+
+def rpc_metrics_middleware(make_request, w3):
+    def middleware(method, params):
+        metrics.incr(f'rpc_requests_total{{method="{method}"}}')
+        with metrics.timer(f'rpc_latency_seconds{{method="{method}"}}'):
+            return make_request(method, params)
+    return middleware
@@ -0,0 +1,74 @@
+from django.conf import settings
+from hexbytes import HexBytes
+from web3._utils.abi import get_abi_output_types, map_abi_data
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
+
+from talecraft.crypto import web3
+from talecraft.rpc import BATCH_METHOD
+
+# Multicall3, deployed at the same address on Avalanche C-chain mainnet and Fuji
+MULTICALL_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+
+multicall_abi = [{
+    'name': 'aggregate3',
+    'type': 'function',
+    'stateMutability': 'payable',
+    'inputs': [{'name': 'calls', 'type': 'tuple[]', 'components': [
+        {'name': 'target', 'type': 'address'},
+        {'name': 'allowFailure', 'type': 'bool'},
+        {'name': 'callData', 'type': 'bytes'},
+    ]}],
+    'outputs': [{'name': 'returnData', 'type': 'tuple[]', 'components': [
+        {'name': 'success', 'type': 'bool'},
+        {'name': 'returnData', 'type': 'bytes'},
+    ]}],
+}]
+
+multicall_contract = web3.eth.contract(address=MULTICALL_ADDRESS, abi=multicall_abi)
+
+
+def _decode_result(fn, data):
+    output_types = get_abi_output_types(fn.abi)
+    result = map_abi_data(BASE_RETURN_NORMALIZERS, output_types, web3.codec.decode_abi(output_types, data))
+    return result[0] if len(result) == 1 else result
+
+
+def multicall(calls, batch_size=100):
+    """
+    Executes contract view calls (e.g. ``marketplace.functions.getListing(1)``) through Multicall3,
+    ``batch_size`` calls per ``eth_call``. Results are decoded the same way ``.call()`` does.
+    """
+    results = []
+    for offset in range(0, len(calls), batch_size):
+        batch = calls[offset:offset + batch_size]
+        response = multicall_contract.functions.aggregate3([
+            (fn.address, False, fn._encode_transaction_data()) for fn in batch
+        ]).call()
+        results.extend(_decode_result(fn, data) for fn, (_, data) in zip(batch, response))
+    return results
+
+
+def batch_request(calls, batch_size=None):
+    """
+    Sends ``(method, params)`` pairs to the node as JSON-RPC batches of ``batch_size`` requests
+    and returns their results in order. Raises ``ValueError`` if any of the requests failed.
+    """
+    batch_size = batch_size or settings.ETH_RPC_BATCH_SIZE
+    results = []
+    for offset in range(0, len(calls), batch_size):
+        for response in web3.manager.request_blocking(BATCH_METHOD, calls[offset:offset + batch_size]):
+            if not response or 'error' in response:
+                raise ValueError(response['error'] if response else 'No response to a batched request')
+            results.append(response['result'])
+    return results
+
+
+def batch_call(calls, batch_size=None):
+    """
+    Executes contract view calls as batched ``eth_call`` requests. Unlike ``multicall()`` the calls are
+    executed separately by the node, so this also works for calls too heavy to aggregate in a single ``eth_call``.
+    """
+    results = batch_request([
+        ('eth_call', [{'to': fn.address, 'data': fn._encode_transaction_data()}, 'latest']) for fn in calls
+    ], batch_size)
+    return [_decode_result(fn, HexBytes(data)) for fn, data in zip(calls, results)]
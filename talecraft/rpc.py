@@ -0,0 +1,217 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import HTTPProvider
+from web3._utils.encoding import FriendlyJsonSerde
+
+from talecraft.metrics import metrics
+
+# pseudo-method sending its params, a list of ``(method, params)`` pairs, as a single JSON-RPC batch
+BATCH_METHOD = 'rpc_batch'
+# methods which must not be sent to more than one node
+NON_IDEMPOTENT_METHODS = {'eth_sendRawTransaction', 'eth_sendTransaction'}
+# methods (like batches) slow by nature and heavy for the node, which only move to the next node once they fail
+UNHEDGED_METHODS = {'eth_getLogs'}
+# asks a node for its head
+HEAD_REQUEST = json.dumps({'jsonrpc': '2.0', 'method': 'eth_blockNumber', 'params': [], 'id': 0})
+# weight of the latest request in the rolling latency and error rate of an endpoint
+EWMA_ALPHA = 0.2
+# a request is hedged once it takes this many times the usual latency of its endpoint
+HEDGE_LATENCY_FACTOR = 3
+
+
+def logs_to_block(method, params):
+    """Last block read by an ``eth_getLogs`` request, if it is given by number."""
+    if method != 'eth_getLogs' or not params:
+        return None
+    to_block = params[0].get('toBlock')
+    if isinstance(to_block, int):
+        return to_block
+    if isinstance(to_block, str) and to_block.startswith('0x'):
+        return int(to_block, 16)
+    return None
+
+
+def make_session(pool_size, retries):
+    session = requests.Session()
+    # blocking pool: at most ``pool_size`` requests are in flight to the node, the others wait for a connection
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retries, pool_block=True)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class BatchHTTPProvider(HTTPProvider):
+    """
+    ``HTTPProvider`` with one keep-alive session shared by all threads, pooling up to ``pool_size`` connections.
+
+    A ``rpc_batch`` request is posted as a JSON-RPC batch and its result is the list of the individual responses,
+    in the order of the requests. Going through ``web3.manager`` like any other method, batches are seen by the
+    metrics and cassette middlewares too.
+    """
+
+    def __init__(self, endpoint_uri, pool_size=10, retries=3, timeout=30):
+        super().__init__(endpoint_uri, request_kwargs={'timeout': timeout})
+        self.session = make_session(pool_size, retries)
+
+    def post(self, data, idempotent=True, hedged=True, min_block=None):
+        response = self.session.post(self.endpoint_uri, data=data, **self.get_request_kwargs())
+        response.raise_for_status()
+        return response.content
+
+    def make_request(self, method, params):
+        if method == BATCH_METHOD:
+            return self.make_batch_request(params)
+        return self.decode_rpc_response(self.post(self.encode_rpc_request(method, params),
+                                                  idempotent=method not in NON_IDEMPOTENT_METHODS,
+                                                  hedged=method not in UNHEDGED_METHODS,
+                                                  min_block=logs_to_block(method, params)))
+
+    def make_batch_request(self, calls):
+        payload = [{'jsonrpc': '2.0', 'method': method, 'params': params or [], 'id': next(self.request_counter)}
+                   for method, params in calls]
+        idempotent = not any(method in NON_IDEMPOTENT_METHODS for method, _ in calls)
+        responses = self.decode_rpc_response(self.post(FriendlyJsonSerde().json_encode(payload), idempotent=idempotent, hedged=False))
+        if not isinstance(responses, list):
+            # the node rejected the batch as a whole
+            return responses
+        by_id = {response.get('id'): response for response in responses}
+        return {'jsonrpc': '2.0', 'id': None, 'result': [by_id.get(request['id']) for request in payload]}
+
+
+class Endpoint:
+    """
+    Rolling latency and error rate of a single RPC node, and its circuit breaker.
+
+    Node URIs often contain an API key, ``name`` (position in the pool and host) is what gets logged and labels the metrics.
+    """
+
+    def __init__(self, uri, session, index=0):
+        self.uri = uri
+        self.name = f'{index}:{urlsplit(uri).hostname}'
+        self.session = session
+        self.latency = None
+        self.error_rate = 0
+        self.failures = 0
+        self.open_until = 0
+        # highest block number the node reported
+        self.head = None
+
+    def __repr__(self):
+        return f'<Endpoint {self.name} latency={self.latency} error_rate={self.error_rate:.2f}>'
+
+    def available(self, now):
+        return self.open_until <= now
+
+    def score(self):
+        # nodes without measurements go first, so that every node gets measured, unless they keep failing
+        return (self.latency or 0) * (1 + 10 * self.error_rate) + self.error_rate
+
+    def succeeded(self, elapsed):
+        self.latency = elapsed if self.latency is None else self.latency + EWMA_ALPHA * (elapsed - self.latency)
+        self.error_rate -= EWMA_ALPHA * self.error_rate
+        self.failures = 0
+        self.open_until = 0
+
+    def failed(self, now, failure_threshold, cooldown):
+        self.error_rate += EWMA_ALPHA * (1 - self.error_rate)
+        self.failures += 1
+        if self.failures >= failure_threshold:
+            self.open_until = now + cooldown
+
+
+class PooledHTTPProvider(BatchHTTPProvider):
+    """
+    ``BatchHTTPProvider`` spreading requests over several RPC nodes.
+
+    Each request goes to the available node with the lowest rolling latency and error rate. If it fails, the next
+    node is tried; if it takes longer than ``hedge_after`` seconds (or ``HEDGE_LATENCY_FACTOR`` times the usual
+    latency of the node, whichever is more), the request is also sent to the next node and the first response wins;
+    ``UNHEDGED_METHODS`` and batches are not hedged.
+    ``eth_getLogs`` only goes to the nodes whose head has reached its ``toBlock``: a node lagging behind the one
+    the head was read from would return the logs of the blocks it has, and the others would be skipped for good.
+    A node failing ``failure_threshold`` requests in a row is left out for ``cooldown`` seconds, and gets a single
+    request after that to tell whether it has recovered.
+    """
+
+    def __init__(self, endpoint_uris, pool_size=10, retries=1, timeout=30, hedge_after=0.5, failure_threshold=3, cooldown=30):
+        super().__init__(endpoint_uris[0], pool_size=pool_size, retries=retries, timeout=timeout)
+        self.endpoints = [Endpoint(uri, make_session(pool_size, retries), index) for index, uri in enumerate(endpoint_uris)]
+        self.hedge_after = hedge_after
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=pool_size * len(self.endpoints), thread_name_prefix='rpc')
+
+    def __str__(self):
+        return f'RPC connection pool {", ".join(endpoint.name for endpoint in self.endpoints)}'
+
+    def ranked_endpoints(self):
+        now = time.monotonic()
+        with self.lock:
+            available = sorted((e for e in self.endpoints if e.available(now)), key=Endpoint.score)
+            if available:
+                return available
+            # every circuit is open, try the node which is due to recover first
+            return [min(self.endpoints, key=lambda e: e.open_until)]
+
+    def synced_endpoints(self, endpoints, min_block):
+        """Leaves out the nodes which haven't reached ``min_block``, asking the nodes for their head when it is not known to be there."""
+        behind = [e for e in endpoints if e.head is None or e.head < min_block]
+        for endpoint, future in [(e, self.executor.submit(self.send, e, HEAD_REQUEST)) for e in behind]:
+            try:
+                head = int(json.loads(future.result())['result'], 16)
+            except (requests.RequestException, KeyError, TypeError, ValueError):
+                continue
+            with self.lock:
+                endpoint.head = max(endpoint.head or 0, head)
+        synced = [e for e in endpoints if e.head is not None and e.head >= min_block]
+        if not synced:
+            raise Exception(f'None of the RPC nodes has reached block {min_block} yet')
+        return synced
+
+    def send(self, endpoint, data):
+        started = time.monotonic()
+        try:
+            response = endpoint.session.post(endpoint.uri, data=data, **self.get_request_kwargs())
+            response.raise_for_status()
+        except requests.RequestException:
+            with self.lock:
+                endpoint.failed(time.monotonic(), self.failure_threshold, self.cooldown)
+            metrics.incr(f'rpc_endpoint_errors_total{{endpoint="{endpoint.name}"}}')
+            raise
+        with self.lock:
+            endpoint.succeeded(time.monotonic() - started)
+        metrics.set(f'rpc_endpoint_latency_seconds{{endpoint="{endpoint.name}"}}', endpoint.latency)
+        return response.content
+
+    def post(self, data, idempotent=True, hedged=True, min_block=None):
+        candidates = self.ranked_endpoints()
+        if min_block is not None:
+            candidates = self.synced_endpoints(candidates, min_block)
+        if len(candidates) == 1 or not idempotent:
+            return self.send(candidates[0], data)
+
+        futures = set()
+        error = None
+        while candidates or futures:
+            timeout = None
+            if candidates:
+                endpoint = candidates.pop(0)
+                futures.add(self.executor.submit(self.send, endpoint, data))
+                if candidates and hedged:
+                    timeout = max(self.hedge_after, HEDGE_LATENCY_FACTOR * (endpoint.latency or 0))
+            done, futures = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                metrics.incr('rpc_hedged_requests_total')
+            for future in done:
+                try:
+                    return future.result()
+                except requests.RequestException as e:
+                    error = e
+        raise error
@@ -172,3 +172,14 @@ CONSTANCE_CONFIG = {
 DBSETTINGS_VALUE_LENGTH = 2048
 STATICFILES_STORAGE = 'spa.storage.SPAStaticFilesStorage'
 TESTNET = (BASE_DIR / '.testnet').exists()
+INDEXER_CONFIRMATIONS = env.int('INDEXER_CONFIRMATIONS', 2)
+# deploy block of the resource contract, looked up on the node (which must serve historical state) when not set
+INDEXER_RESOURCE_START_BLOCK = env.int('INDEXER_RESOURCE_START_BLOCK', None)
+# directory to record JSON-RPC responses to or replay them from, see talecraft.cassette
+ETH_RPC_CASSETTE = env.str('ETH_RPC_CASSETTE', None)
+ETH_RPC_CASSETTE_MODE = env.str('ETH_RPC_CASSETTE_MODE', 'replay')
+# RPC nodes to spread chain reads over, the public endpoint of the network by default
+ETH_RPC_ENDPOINTS = env.list('ETH_RPC_ENDPOINTS', default=[])
+# keep-alive connections kept open to each RPC node, and calls sent per JSON-RPC batch
+ETH_RPC_POOL_SIZE = env.int('ETH_RPC_POOL_SIZE', 10)
+ETH_RPC_BATCH_SIZE = env.int('ETH_RPC_BATCH_SIZE', 100)